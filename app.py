@@ -103,6 +103,10 @@ from src.ui.streamlit.dashboard import Dashboard
 from src.ui.streamlit.bitrix_dashboard import BitrixDashboard
 from src.ui.streamlit.responsavel_dashboard import ResponsavelDashboard
 from src.services.familia_service import familia_service
+from src.data.cache_warmer import start_cache_warmer
+
+# Pré-aquecimento do cache do Bitrix24 (uma única thread por processo do servidor)
+start_cache_warmer()
 
 # Configuração da página
 st.set_page_config(
@@ -0,0 +1,105 @@
+"""
+Benchmark dos formatos de cache do DataRepository
+
+Compara pickle, Arrow IPC e Parquet (com as compressões disponíveis) na
+gravação, na leitura completa, na leitura de poucas colunas e no tamanho em
+disco, usando o DataFrame mais recente do cache do Bitrix24 (ou um arquivo
+indicado).
+
+Para executar:
+python benchmark_cache.py [--cache-dir ./cache] [--source arquivo.pkl] [--repeat 3]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.data.data_repository import DataRepository, CACHE_COMPRESSIONS, pa
+
+# Colunas usadas no teste de leitura parcial
+PROJECTION = ["ID", "Fase", "Responsável", "Criado"]
+
+
+def load_source(cache_dir, source, backup_dir):
+    """
+    Carrega o DataFrame de teste: o arquivo indicado ou o snapshot mais recente do cache.
+
+    backup_dir deve ser um diretório descartável: a limpeza do DataRepository
+    remove backups além de BACKUP_MAX_FILES, e o benchmark não pode apagar os
+    backups reais do dashboard.
+    """
+    if source:
+        repository = DataRepository(Path(source).parent, backup_dir=backup_dir)
+        entry = repository.load_cache_entry(Path(source).stem)
+    else:
+        entry = DataRepository(cache_dir, backup_dir=backup_dir).find_latest_entry("bitrix_data")
+
+    if entry is None or not isinstance(entry["data"], pd.DataFrame):
+        raise SystemExit("Nenhum DataFrame encontrado para o benchmark")
+    return entry["data"]
+
+
+def measure(fn, repeat):
+    """Retorna o menor tempo (em segundos) entre as execuções."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(df, repeat):
+    """Executa o benchmark para todas as combinações de formato e compressão."""
+    variants = [("pickle", None)]
+    if pa is not None:
+        variants += [(fmt, compression) for fmt in ("arrow", "parquet") for compression in CACHE_COMPRESSIONS]
+    else:
+        print("pyarrow não instalado: apenas o pickle será medido")
+
+    columns = [col for col in PROJECTION if col in df.columns]
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, compression in variants:
+            repository = DataRepository(
+                tmp, cache_format=fmt, compression=compression, backup_dir=Path(tmp) / "backups"
+            )
+            key = f"benchmark_{fmt}_{compression}"
+
+            write = measure(lambda: repository.save_to_cache(df, key), repeat)
+            path = repository._cache_path(key)
+            read = measure(lambda: repository.load_from_cache(key), repeat)
+            read_columns = measure(lambda: repository.load_from_cache(key, columns=columns), repeat)
+
+            results.append({
+                "formato": fmt,
+                "compressão": compression or "-",
+                "gravação (s)": round(write, 4),
+                "leitura (s)": round(read, 4),
+                f"leitura {len(columns)} colunas (s)": round(read_columns, 4),
+                "tamanho (MB)": round(path.stat().st_size / 1024 ** 2, 2),
+            })
+
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos formatos de cache do DataRepository")
+    parser.add_argument("--cache-dir", default="./cache", help="Diretório de cache com os dados do Bitrix24")
+    parser.add_argument("--source", help="Arquivo de cache específico a usar no teste")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por medição (vale a menor)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        df = load_source(args.cache_dir, args.source, backup_dir=Path(scratch) / "backups")
+    print(f"DataFrame de teste: {len(df)} linhas, {len(df.columns)} colunas, "
+          f"{df.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB em memória\n")
+    print(run(df, args.repeat).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
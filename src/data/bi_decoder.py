@@ -0,0 +1,82 @@
+import json
+import logging
+import pandas as pd
+
+# Parser JSON mais rápido, se disponível
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("BIDecoder")
+
+
+def loads(content):
+    """
+    Decodifica o corpo JSON de uma resposta do BI connector.
+
+    Usa o orjson quando instalado e o módulo json da biblioteca padrão caso contrário.
+    Em ambos os casos, um JSON inválido levanta json.JSONDecodeError.
+
+    Args:
+        content: Corpo da resposta (bytes ou str)
+
+    Returns:
+        Objeto Python decodificado
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def is_matrix(response):
+    """Indica se a resposta está no formato de matriz (cabeçalhos seguidos de linhas)."""
+    return isinstance(response, list) and len(response) > 0 and isinstance(response[0], list)
+
+
+def matrix_to_dataframe(response):
+    """
+    Converte uma resposta do BI connector em DataFrame.
+
+    No formato de matriz (array de arrays), a primeira linha traz os cabeçalhos e
+    as demais os dados. As colunas são montadas diretamente a partir das linhas,
+    sem criar um dicionário por registro. Linhas com quantidade de valores
+    diferente da quantidade de cabeçalhos são descartadas e contadas.
+
+    Args:
+        response: Resposta decodificada (matriz, lista de registros ou dicionário)
+
+    Returns:
+        Tupla (DataFrame, quantidade de linhas inválidas descartadas)
+    """
+    if not is_matrix(response):
+        if not response:
+            return pd.DataFrame(), 0
+        return pd.DataFrame(response), 0
+
+    headers = response[0]
+    rows = response[1:]
+    width = len(headers)
+
+    valid_rows = [row for row in rows if isinstance(row, list) and len(row) == width]
+    invalid_rows = len(rows) - len(valid_rows)
+    if invalid_rows:
+        logger.warning(f"{invalid_rows} linhas com quantidade de colunas diferente de {width} foram descartadas")
+
+    if not valid_rows:
+        return pd.DataFrame(columns=headers), invalid_rows
+
+    # Cabeçalhos repetidos não podem ser chaves de dicionário
+    if len(set(headers)) != width:
+        return pd.DataFrame(valid_rows, columns=headers), invalid_rows
+
+    # Transpor as linhas em colunas de uma só vez
+    columns = zip(*valid_rows)
+    df = pd.DataFrame({header: list(values) for header, values in zip(headers, columns)})
+
+    return df, invalid_rows
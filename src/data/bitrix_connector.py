@@ -1,12 +1,28 @@
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import json
 import os
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import threading
+import time
 import logging
-import streamlit as st
 import sys
 
+# O Streamlit é opcional: sem ele (ex: python -m src.data.ingest), os erros vão apenas para o log
+try:
+    import streamlit as st
+except ImportError:
+    st = None
+
+from .bi_decoder import loads, matrix_to_dataframe
+from .single_flight import shared_flight, request_key
+from .rate_limiter import get_rate_limiter, parse_retry_after, THROTTLE_STATUS_CODES, RETRYABLE_STATUS_CODES
+from .circuit_breaker import get_circuit_breaker
+from .schema import parse_datetime
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -14,17 +30,46 @@ logging.basicConfig(
 )
 logger = logging.getLogger("BitrixConnector")
 
+# Resultado de uma requisição ao BI connector
+REQUEST_OK = "ok"              # Resposta válida (mesmo que vazia)
+REQUEST_REJECTED = "rejected"  # O formato da consulta foi recusado pela API
+REQUEST_ERROR = "error"        # Falha transitória (rede, timeout, erro do servidor)
+
+# Códigos HTTP que indicam consulta em formato não aceito pela API
+REJECTED_STATUS_CODES = (400, 405, 422)
+
+
+class BitrixFetchError(Exception):
+    """
+    Falha que deixa o resultado de uma busca incompleto (ex: uma página
+    intermediária não pôde ser obtida). O resultado parcial não deve ser usado
+    nem guardado em cache.
+    """
+
 # Função para verificar se estamos em um ambiente Streamlit ativo
 def is_streamlit_running():
     """
     Verifica se estamos em um ambiente Streamlit ativo de forma segura.
     
+    Apenas a thread que executa o script de uma sessão pode exibir mensagens;
+    threads em segundo plano (pré-aquecimento, atualização de dados expirados)
+    e processos sem Streamlit registram os erros apenas no log.
+    
     Returns:
         True se o ambiente Streamlit estiver ativo, False caso contrário.
     """
+    if st is None:
+        return False
     try:
-        # Verifica se estamos em um script Streamlit
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        # Versões antigas do Streamlit
         return st._is_running if hasattr(st, '_is_running') else 'streamlit.runtime' in sys.modules
+    try:
+        try:
+            return get_script_run_ctx(suppress_warning=True) is not None
+        except TypeError:
+            return get_script_run_ctx() is not None
     except (NameError, AttributeError):
         return False
 
@@ -34,22 +79,30 @@ class BitrixConnector:
     e realizar as consultas necessárias.
     """
     
-    def __init__(self, base_url=None, token=None):
+    # Formatos de consulta aceitos pela tabela crm_deal, na ordem de tentativa
+    QUERY_DIALECTS = ("dimensions", "filter_select", "filter_list")
+    
+    def __init__(self, base_url=None, token=None, max_workers=None, dialect_cache_path=None):
         """
         Inicializa o conector com a URL base e o token de autenticação.
         
         Args:
             base_url: URL base da API do Bitrix24. Se None, será lido da variável de ambiente BITRIX_BASE_URL
             token: Token de autenticação. Se None, será lido da variável de ambiente BITRIX_TOKEN
+            max_workers: Número máximo de requisições simultâneas nas buscas em lote.
+                Se None, será lido da variável de ambiente BITRIX_MAX_WORKERS (padrão: 4)
+            dialect_cache_path: Arquivo JSON onde o formato de consulta aceito por tabela é lembrado.
+                Se None, será lido da variável de ambiente BITRIX_DIALECT_CACHE
+                (padrão: ./cache/bitrix_dialects.json)
         """
         # Primeiro, tentar obter das secrets do Streamlit
         try:
-            if "bitrix" in st.secrets:
+            if st is not None and "bitrix" in st.secrets:
                 logger.info("Tentando carregar configurações do Bitrix24 das secrets do Streamlit")
                 self.base_url = base_url or st.secrets["bitrix"]["base_url"]
                 self.token = token or st.secrets["bitrix"]["token"]
                 logger.info("Configurações carregadas das secrets do Streamlit (seção bitrix)")
-            elif "BITRIX_BASE_URL" in st.secrets:
+            elif st is not None and "BITRIX_BASE_URL" in st.secrets:
                 logger.info("Tentando carregar configurações do Bitrix24 das secrets diretas do Streamlit")
                 self.base_url = base_url or st.secrets["BITRIX_BASE_URL"]
                 self.token = token or st.secrets["BITRIX_TOKEN"]
@@ -75,20 +128,77 @@ class BitrixConnector:
             self.base_url = "https://eunaeuropacidadania.bitrix24.com.br/bitrix/tools/biconnector/pbi.php"
             logger.warning("URL base não encontrada nas variáveis de ambiente ou secrets! Usando URL padrão definida no código.")
             
+        # Limite de concorrência para as buscas em lote (ex: campos personalizados)
+        if max_workers is None:
+            try:
+                max_workers = int(os.environ.get("BITRIX_MAX_WORKERS", 4))
+            except (ValueError, TypeError):
+                max_workers = 4  # Valor padrão
+        self.max_workers = max(1, max_workers)
+        
+        # Sessão HTTP compartilhada (keep-alive) com pool dimensionado para os workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # Limitador de requisições compartilhado por todo o processo
+        self.rate_limiter = get_rate_limiter()
+        
+        # Disjuntor compartilhado por todas as conexões com o mesmo portal
+        self.circuit_breaker = get_circuit_breaker(self.base_url)
+            
         logger.info(f"BitrixConnector inicializado com URL base: {self.base_url}")
         logger.info(f"Token configurado: {'OK (não vazio)' if self.token else 'FALHA (vazio)'}")
+        logger.info(f"Requisições simultâneas permitidas: {self.max_workers}")
+        
+        # Cache em disco do formato de consulta aceito por (base_url, tabela)
+        self.dialect_cache_path = Path(
+            dialect_cache_path or os.environ.get("BITRIX_DIALECT_CACHE", "./cache/bitrix_dialects.json")
+        )
+        self._dialects = None
+        self._dialects_lock = threading.Lock()
+        
+        # Linhas descartadas na decodificação por terem quantidade de colunas inválida
+        self.invalid_rows = 0
+        self._stats_lock = threading.Lock()
     
-    def _make_request(self, table, query_params):
+    def _send_request(self, table, query_params):
         """
-        Realiza uma requisição à API do Bitrix24.
+        Realiza uma requisição à API do Bitrix24 e classifica o resultado.
+        
+        Requisições idênticas (mesma URL base, tabela e parâmetros) feitas ao mesmo
+        tempo por sessões diferentes são enviadas uma única vez e compartilham a resposta.
         
         Args:
             table: Nome da tabela a ser consultada (ex: 'crm_deal')
             query_params: Parâmetros da consulta em formato JSON
             
         Returns:
-            Uma lista com os dados da resposta ou None em caso de erro
+            Tupla (status, dados), como em _do_send_request
+        """
+        key = request_key(table, query_params, self.base_url)
+        result, _ = shared_flight.do(key, self._do_send_request, table, query_params)
+        return result
+    
+    def _do_send_request(self, table, query_params):
         """
+        Envia uma requisição à API do Bitrix24 e classifica o resultado.
+        
+        Args:
+            table: Nome da tabela a ser consultada (ex: 'crm_deal')
+            query_params: Parâmetros da consulta em formato JSON
+            
+        Returns:
+            Tupla (status, dados), onde status é REQUEST_OK, REQUEST_REJECTED
+            (formato de consulta recusado) ou REQUEST_ERROR (falha transitória)
+            e dados é a resposta decodificada ou None
+        """
+        # Falhar imediatamente enquanto o disjuntor estiver aberto
+        if not self.circuit_breaker.allow_request():
+            logger.warning(f"Disjuntor aberto: requisição para {table} não enviada")
+            return REQUEST_ERROR, None
+        
         # Construir a URL completa
         url = f"{self.base_url}?token={self.token}&table={table}"
         
@@ -108,20 +218,30 @@ class BitrixConnector:
             payload = json.dumps(query_params)
             
             logger.info("Enviando requisição POST...")
-            response = requests.post(url, headers=headers, data=payload, timeout=30)
+            response = self._post_with_retry(url, headers, payload)
+            
+            # Qualquer resposta não transitória mostra que o portal está respondendo
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
             
             # Verificar status da resposta
             logger.info(f"Status da resposta: {response.status_code}")
             
             # Registrar os primeiros 1000 caracteres da resposta para debug
-            response_text = response.text[:1000] + "..." if len(response.text) > 1000 else response.text
+            # (sem decodificar o corpo inteiro como texto)
+            content = response.content
+            response_text = content[:1000].decode(response.encoding or "utf-8", errors="replace")
+            if len(content) > 1000:
+                response_text += "..."
             logger.info(f"Resposta: {response_text}")
             
             # Se a resposta for bem-sucedida, converter para JSON
             if response.status_code == 200:
                 try:
                     # Aqui o retorno pode ser uma lista vazia, o que é válido
-                    data = response.json()
+                    data = loads(content)
                     # Verificar se há erro específico no JSON
                     if isinstance(data, dict) and "error" in data:
                         logger.error(f"Erro na resposta do Bitrix24: {data['error']}")
@@ -135,31 +255,34 @@ class BitrixConnector:
                         if is_streamlit_running():
                             st.error(f"Erro na API do Bitrix24: {data.get('error')} - {data.get('error_description', '')}")
                             
-                        return None
+                        return REQUEST_REJECTED, None
                     
                     logger.info(f"Dados obtidos com sucesso. Total de registros: {len(data) if isinstance(data, list) else 'N/A (não é lista)'}")
-                    return data
+                    return REQUEST_OK, data
                 except json.JSONDecodeError as e:
                     logger.error(f"Erro ao decodificar resposta JSON: {str(e)}")
-                    logger.error(f"Resposta recebida (primeiros 200 caracteres): {response.text[:200]}")
+                    logger.error(f"Resposta recebida (primeiros 200 caracteres): {response_text[:200]}")
                     
                     # Adicionar mensagem na tela para o usuário
                     if is_streamlit_running():
                         st.error(f"Erro ao processar resposta do Bitrix24: Formato inválido")
-                        st.code(response.text[:500], language="json")
+                        st.code(response_text[:500], language="json")
                     
-                    return None
+                    return REQUEST_REJECTED, None
             else:
                 logger.error(f"Erro na requisição: {response.status_code} - {response.reason}")
-                logger.error(f"Resposta de erro: {response.text}")
+                logger.error(f"Resposta de erro: {response_text}")
                 
                 # Adicionar mensagem na tela para o usuário
                 if is_streamlit_running():
                     st.error(f"Erro na conexão com Bitrix24: {response.status_code} - {response.reason}")
                 
-                return None
+                if response.status_code in REJECTED_STATUS_CODES:
+                    return REQUEST_REJECTED, None
+                return REQUEST_ERROR, None
                 
         except requests.exceptions.RequestException as e:
+            self.circuit_breaker.record_failure()
             logger.error(f"Erro na requisição HTTP: {str(e)}")
             # Informações detalhadas para ajudar no diagnóstico
             error_type = type(e).__name__
@@ -170,14 +293,127 @@ class BitrixConnector:
                 st.error(f"Falha na conexão com o Bitrix24: {str(e)}")
                 st.info("Verifique se a URL e o token estão corretos e se há conexão com a internet.")
             
-            return None
+            return REQUEST_ERROR, None
         except Exception as e:
+            self.circuit_breaker.record_failure()
             logger.error(f"Erro inesperado: {str(e)}")
             # Adicionar mensagem na tela para o usuário
             if is_streamlit_running():
                 st.error(f"Erro inesperado: {str(e)}")
             
-            return None
+            return REQUEST_ERROR, None
+    
+    def _post_with_retry(self, url, headers, payload):
+        """
+        Envia o POST respeitando o limitador de requisições, com novas tentativas
+        e backoff exponencial com jitter para falhas transitórias e throttling.
+        
+        Args:
+            url: URL completa da requisição
+            headers: Cabeçalhos HTTP
+            payload: Corpo da requisição já serializado
+            
+        Returns:
+            A última resposta recebida
+            
+        Raises:
+            requests.exceptions.RequestException: se a última tentativa falhar por erro de rede
+        """
+        limiter = self.rate_limiter
+        
+        for attempt in range(limiter.max_retries + 1):
+            retry_after = None
+            try:
+                with limiter.slot():
+                    response = self.session.post(url, headers=headers, data=payload, timeout=30)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                if attempt == limiter.max_retries:
+                    raise
+                delay = limiter.backoff_delay(attempt)
+                logger.warning(f"Falha de conexão ({type(e).__name__}); nova tentativa em {delay:.1f}s ({attempt + 1}/{limiter.max_retries})")
+                time.sleep(delay)
+                continue
+            
+            if response.status_code in THROTTLE_STATUS_CODES:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                limiter.on_throttle(retry_after)
+            elif response.status_code not in RETRYABLE_STATUS_CODES:
+                limiter.on_success()
+                return response
+            
+            if attempt == limiter.max_retries:
+                return response
+            
+            delay = limiter.backoff_delay(attempt, retry_after)
+            logger.warning(f"Resposta {response.status_code} do Bitrix24; nova tentativa em {delay:.1f}s ({attempt + 1}/{limiter.max_retries})")
+            time.sleep(delay)
+        
+        return response
+    
+    def _make_request(self, table, query_params):
+        """
+        Realiza uma requisição à API do Bitrix24.
+        
+        Args:
+            table: Nome da tabela a ser consultada (ex: 'crm_deal')
+            query_params: Parâmetros da consulta em formato JSON
+            
+        Returns:
+            Uma lista com os dados da resposta ou None em caso de erro
+        """
+        _, data = self._send_request(table, query_params)
+        return data
+    
+    def _load_dialects(self):
+        """Carrega do disco o mapa de formatos de consulta aceitos (chamar com o lock adquirido)."""
+        if self._dialects is None:
+            self._dialects = {}
+            if self.dialect_cache_path.exists():
+                try:
+                    with open(self.dialect_cache_path, 'r', encoding='utf-8') as f:
+                        self._dialects = json.load(f)
+                except Exception as e:
+                    logger.warning(f"Não foi possível ler o cache de formatos de consulta: {str(e)}")
+        return self._dialects
+    
+    def _save_dialects(self):
+        """Grava no disco o mapa de formatos de consulta aceitos (chamar com o lock adquirido)."""
+        try:
+            self.dialect_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.dialect_cache_path, 'w', encoding='utf-8') as f:
+                json.dump(self._dialects, f, indent=2)
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar o cache de formatos de consulta: {str(e)}")
+    
+    def get_dialect(self, table):
+        """
+        Retorna o formato de consulta já negociado para a tabela.
+        
+        Args:
+            table: Nome da tabela (ex: 'crm_deal')
+            
+        Returns:
+            Nome do formato (um de QUERY_DIALECTS) ou None se ainda não negociado
+        """
+        with self._dialects_lock:
+            return self._load_dialects().get(f"{self.base_url}|{table}")
+    
+    def set_dialect(self, table, dialect):
+        """
+        Lembra (ou esquece, se dialect for None) o formato de consulta aceito pela tabela.
+        
+        Args:
+            table: Nome da tabela (ex: 'crm_deal')
+            dialect: Nome do formato ou None para remover
+        """
+        key = f"{self.base_url}|{table}"
+        with self._dialects_lock:
+            dialects = self._load_dialects()
+            if dialect is None:
+                dialects.pop(key, None)
+            else:
+                dialects[key] = dialect
+            self._save_dialects()
     
     def get_deals(self, filters=None, select=None, category_id=None):
         """
@@ -265,127 +501,337 @@ class BitrixConnector:
         # Realizar a consulta
         return self._make_request("crm_contact", query_params)
     
+    @staticmethod
+    def _build_deal_query(dialect, start_date, end_date, category_id, limit, offset, time_filter_column):
+        """
+        Monta os parâmetros de consulta da tabela crm_deal no formato indicado.
+        
+        Args:
+            dialect: Nome do formato (um de QUERY_DIALECTS)
+            start_date: Data inicial no formato 'YYYY-MM-DD'
+            end_date: Data final no formato 'YYYY-MM-DD'
+            category_id: ID da categoria para filtrar
+            limit: Quantidade de registros da página
+            offset: Offset da página
+            time_filter_column: Coluna de data usada no filtro do período
+            
+        Returns:
+            Dicionário com os parâmetros da consulta
+        """
+        select = ["ID", "DATE_CREATE", "DATE_MODIFY", "CLOSEDATE", 
+                  "TITLE", "STAGE_NAME", "ASSIGNED_BY_NAME"]
+        
+        if dialect == "dimensions":
+            # Formato de consulta baseado no exemplo fornecido
+            return {
+                "dateRange": {
+                    "startDate": start_date,
+                    "endDate": end_date
+                },
+                "configParams": {
+                    "timeFilterColumn": time_filter_column
+                },
+                "dimensionsFilters": [
+                    [
+                        {
+                            "fieldName": "CATEGORY_ID",
+                            "values": [category_id],
+                            "type": "INCLUDE",
+                            "operator": "EQUALS"
+                        }
+                    ]
+                ],
+                "fields": [{ "name": field } for field in select],
+                "limit": limit,
+                "offset": offset
+            }
+        
+        if dialect == "filter_select":
+            return {
+                "filter": {
+                    f">={time_filter_column}": start_date,
+                    f"<={time_filter_column}": end_date,
+                    "CATEGORY_ID": category_id
+                },
+                "select": select,
+                "limit": limit,
+                "start": offset
+            }
+        
+        if dialect == "filter_list":
+            return {
+                "select": select,
+                "filter": [
+                    ["CATEGORY_ID", "=", category_id],
+                    [f">={time_filter_column}", start_date],
+                    [f"<={time_filter_column}", end_date]
+                ],
+                "limit": limit,
+                "offset": offset
+            }
+        
+        raise ValueError(f"Formato de consulta desconhecido: {dialect}")
+    
+    def _fetch_deals_page(self, start_date, end_date, category_id, limit, offset, time_filter_column="DATE_CREATE"):
+        """
+        Busca uma página bruta da tabela crm_deal no formato de consulta negociado.
+        
+        O formato aceito é lembrado por (base_url, tabela). Sem formato conhecido,
+        os formatos de QUERY_DIALECTS são testados em ordem até um ser aceito.
+        Uma resposta vazia com cabeçalhos é um resultado válido e não provoca
+        novas tentativas, assim como falhas transitórias (rede, timeout, 5xx,
+        autenticação). O formato conhecido só é substituído quando outro formato
+        é aceito: uma recusa que nenhum formato resolve não estava ligada ao
+        formato e não apaga o que foi negociado.
+        
+        Args:
+            start_date: Data inicial no formato 'YYYY-MM-DD'
+            end_date: Data final no formato 'YYYY-MM-DD'
+            category_id: ID da categoria para filtrar
+            limit: Quantidade de registros da página
+            offset: Offset da página
+            time_filter_column: Coluna de data usada no filtro do período
+            
+        Returns:
+            A resposta da API (lista) ou None em caso de erro
+        """
+        table = "crm_deal"
+        known_dialect = self.get_dialect(table)
+        candidates = list(self.QUERY_DIALECTS)
+        if known_dialect in candidates:
+            candidates.remove(known_dialect)
+            candidates.insert(0, known_dialect)
+        
+        logger.info(f"Buscando deals com {time_filter_column} no período {start_date} a {end_date}, categoria {category_id} (offset {offset})")
+        inconclusive = None
+        
+        for dialect in candidates:
+            query_params = self._build_deal_query(
+                dialect, start_date, end_date, category_id, limit, offset, time_filter_column
+            )
+            status, response = self._send_request(table, query_params)
+            
+            if status == REQUEST_ERROR:
+                # Falha transitória: outro formato não resolveria
+                logger.warning(f"Falha ao consultar {table} no formato '{dialect}'; outros formatos não serão tentados")
+                return None
+            
+            if status == REQUEST_REJECTED:
+                logger.warning(f"Formato '{dialect}' recusado pela tabela {table}")
+                continue
+            
+            # Lista vazia sem cabeçalhos durante a negociação não confirma o formato
+            if response == [] and dialect != known_dialect:
+                logger.info(f"Formato '{dialect}' retornou lista vazia sem cabeçalhos; resultado inconclusivo")
+                inconclusive = response
+                continue
+            
+            if dialect != known_dialect:
+                logger.info(f"Formato de consulta '{dialect}' aceito pela tabela {table}")
+                self.set_dialect(table, dialect)
+            return response
+        
+        if inconclusive is None:
+            logger.warning("Nenhum formato de consulta foi aceito pela API do Bitrix24")
+            if known_dialect is not None:
+                logger.warning(f"Formato '{known_dialect}' mantido para a tabela {table}: a recusa não foi resolvida por outro formato")
+        return inconclusive
+    
+    @staticmethod
+    def _count_rows(response):
+        """
+        Conta os registros de uma resposta bruta, desconsiderando a linha de cabeçalhos
+        quando a resposta está no formato de matriz.
+        """
+        if not isinstance(response, list) or not response:
+            return 0
+        if isinstance(response[0], list):
+            return len(response) - 1
+        return len(response)
+    
+    def _decode_response(self, response):
+        """
+        Converte a resposta bruta do BI connector em DataFrame, contabilizando
+        as linhas descartadas por terem quantidade de colunas inválida.
+        
+        Args:
+            response: Resposta da API (matriz com cabeçalhos ou lista de registros)
+            
+        Returns:
+            DataFrame com os registros da resposta
+        """
+        df, invalid_rows = matrix_to_dataframe(response)
+        if invalid_rows:
+            with self._stats_lock:
+                self.invalid_rows += invalid_rows
+        
+        logger.info(f"Convertido com sucesso para {len(df)} registros com {len(df.columns)} colunas")
+        return df
+    
+    def iter_crm_deals(self, start_date, end_date, category_id=34, page_size=1000, offset=0,
+                       time_filter_column="DATE_CREATE"):
+        """
+        Itera sobre a tabela crm_deal página a página.
+        
+        A busca continua até que uma página venha incompleta (menos registros que
+        page_size). Enquanto uma página é decodificada e consumida, a próxima já
+        está sendo baixada em segundo plano.
+        
+        Args:
+            start_date: Data inicial no formato 'YYYY-MM-DD'
+            end_date: Data final no formato 'YYYY-MM-DD'
+            category_id: ID da categoria para filtrar (padrão: 34)
+            page_size: Quantidade de registros por página (padrão: 1000)
+            offset: Offset inicial (padrão: 0)
+            time_filter_column: Coluna de data usada no filtro do período (padrão: DATE_CREATE)
+            
+        Yields:
+            DataFrame com os registros de cada página
+            
+        Raises:
+            BitrixFetchError: Se alguma página não puder ser obtida (uma resposta
+                vazia, ao contrário, indica que não há negócios no período)
+        """
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            future = prefetcher.submit(
+                self._fetch_deals_page, start_date, end_date, category_id, page_size, offset,
+                time_filter_column
+            )
+            page_number = 1
+            first_row_previous = None
+            
+            while future is not None:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    logger.error(f"Erro ao obter a página {page_number} da tabela crm_deal: {str(e)}")
+                    raise BitrixFetchError(f"Erro ao obter a página {page_number} da tabela crm_deal: {str(e)}") from e
+                
+                # Falha, não ausência de dados: parar aqui deixaria o resultado vazio ou incompleto
+                if response is None:
+                    logger.error(f"Falha ao obter a página {page_number} da tabela crm_deal; busca interrompida")
+                    raise BitrixFetchError(f"Falha ao obter a página {page_number} da tabela crm_deal")
+                
+                if not response:
+                    return
+                
+                # Respostas fora do formato de lista não são paginadas
+                if not isinstance(response, list):
+                    yield self._decode_response(response)
+                    return
+                
+                # Proteção contra APIs que ignoram o offset e devolvem sempre a mesma página
+                first_row = response[1] if isinstance(response[0], list) and len(response) > 1 else response[0]
+                if first_row_previous is not None and first_row == first_row_previous:
+                    logger.warning("A API devolveu a mesma página novamente; paginação interrompida")
+                    return
+                first_row_previous = first_row
+                
+                # Página completa: buscar a próxima antes de decodificar a atual
+                row_count = self._count_rows(response)
+                future = None
+                if row_count >= page_size:
+                    offset += page_size
+                    future = prefetcher.submit(
+                        self._fetch_deals_page, start_date, end_date, category_id, page_size, offset,
+                        time_filter_column
+                    )
+                
+                logger.info(f"Página {page_number} da tabela crm_deal obtida com {row_count} registros")
+                yield self._decode_response(response)
+                page_number += 1
+    
     def get_crm_deals(self, start_date, end_date, category_id=34, limit=1000, offset=0):
         """
         Obtém dados da tabela crm_deal com filtros de data e categoria.
         
+        Todas as páginas são buscadas até o fim do período; limit define o tamanho
+        de cada página.
+        
         Args:
             start_date: Data inicial no formato 'YYYY-MM-DD'
             end_date: Data final no formato 'YYYY-MM-DD'
             category_id: ID da categoria para filtrar (padrão: 34)
-            limit: Limite de registros a retornar (padrão: 1000)
-            offset: Offset para paginação (padrão: 0)
+            limit: Quantidade de registros por página (padrão: 1000)
+            offset: Offset inicial para paginação (padrão: 0)
             
         Returns:
             DataFrame com os dados ou um DataFrame vazio em caso de erro
         """
-        # Formato de consulta baseado no exemplo fornecido
+        try:
+            pages = list(self.iter_crm_deals(start_date, end_date, category_id, page_size=limit, offset=offset))
+            
+            if not pages:
+                return pd.DataFrame()
+            
+            return pd.concat(pages, ignore_index=True)
+            
+        except Exception as e:
+            logger.error(f"Erro ao obter dados da tabela crm_deal: {str(e)}")
+            return pd.DataFrame()
+    
+    def _fetch_uf_chunk(self, chunk, chunk_number):
+        """
+        Busca os campos personalizados (UF) de um único lote de IDs.
+        
+        Args:
+            chunk: Lista de IDs de negócios do lote
+            chunk_number: Número do lote (usado apenas nos logs)
+            
+        Returns:
+            DataFrame com os registros do lote, vazio em caso de erro
+        """
+        # Formato de consulta baseado no exemplo fornecido, adaptado para crm_deal_uf
         query_params = {
-            "dateRange": {
-                "startDate": start_date,
-                "endDate": end_date
-            },
-            "configParams": {
-                "timeFilterColumn": "DATE_CREATE"
-            },
             "dimensionsFilters": [
                 [
                     {
-                        "fieldName": "CATEGORY_ID",
-                        "values": [category_id],
+                        "fieldName": "DEAL_ID",
+                        "values": chunk,
                         "type": "INCLUDE",
                         "operator": "EQUALS"
                     }
                 ]
             ],
             "fields": [
-                { "name": "ID" },
-                { "name": "DATE_CREATE" },
-                { "name": "DATE_MODIFY" },
-                { "name": "CLOSEDATE" },
-                { "name": "TITLE" },
-                { "name": "STAGE_NAME" },
-                { "name": "ASSIGNED_BY_NAME" }
+                { "name": "DEAL_ID" },
+                { "name": "UF_CRM_1722605592778" }, # LINK_ARVORE
+                { "name": "UF_CRM_1737689240946" }, # REUNIAO
+                { "name": "UF_CRM_1740458137391" }  # DATA_FECHAMENTO
             ],
-            "limit": limit,
-            "offset": offset
+            "limit": 1000,
+            "offset": 0
         }
         
         try:
-            # Fazer a requisição à API
-            logger.info(f"Buscando deals no período {start_date} a {end_date}, categoria {category_id}")
-            response = self._make_request("crm_deal", query_params)
-            
-            # Se não obteve resposta, tentar um formato alternativo
-            if not response:
-                logger.warning("Formato principal falhou. Tentando formato alternativo...")
-                alt_query_params = {
-                    "filter": {
-                        ">=DATE_CREATE": start_date,
-                        "<=DATE_CREATE": end_date,
-                        "CATEGORY_ID": category_id
-                    },
-                    "select": ["ID", "DATE_CREATE", "DATE_MODIFY", "CLOSEDATE", 
-                              "TITLE", "STAGE_NAME", "ASSIGNED_BY_NAME"],
-                    "limit": limit,
-                    "start": offset
-                }
-                
-                response = self._make_request("crm_deal", alt_query_params)
-                
-                # Se o formato alternativo também falhou, tentar um terceiro formato
-                if not response:
-                    logger.warning("Formato alternativo também falhou. Tentando terceiro formato...")
-                    third_query_params = {
-                        "select": ["ID", "DATE_CREATE", "DATE_MODIFY", "CLOSEDATE", 
-                                  "TITLE", "STAGE_NAME", "ASSIGNED_BY_NAME"],
-                        "filter": [
-                            ["CATEGORY_ID", "=", category_id],
-                            [">=DATE_CREATE", start_date],
-                            ["<=DATE_CREATE", end_date]
-                        ],
-                        "limit": limit,
-                        "offset": offset
-                    }
-                    
-                    response = self._make_request("crm_deal", third_query_params)
+            logger.info(f"Buscando campos personalizados para {len(chunk)} negócios (chunk {chunk_number})")
+            chunk_result = self._make_request("crm_deal_uf", query_params)
             
-            if not response:
-                logger.warning("Nenhum dado retornado pela API do Bitrix24 após múltiplas tentativas")
-                return pd.DataFrame()
+            if chunk_result:
+                df_chunk = self._decode_response(chunk_result)
+                logger.info(f"Obtidos {len(df_chunk)} registros de campos personalizados")
+                return df_chunk
             
-            # Processar resposta em formato de matriz (array de arrays)
-            if isinstance(response, list) and len(response) > 1:
-                # Verificar se parece com matriz (primeiro elemento também é lista)
-                if isinstance(response[0], list):
-                    logger.info("Resposta encontrada no formato de matriz (array de arrays)")
-                    headers = response[0]  # Primeiro array são os cabeçalhos
-                    data = response[1:]    # Restante são os dados
-                    
-                    # Converter para lista de dicionários
-                    records = []
-                    for row in data:
-                        if len(row) == len(headers):
-                            record = dict(zip(headers, row))
-                            records.append(record)
-                    
-                    logger.info(f"Convertido com sucesso para {len(records)} registros com {len(headers)} colunas")
-                    return pd.DataFrame(records)
-            
-            # Converter para DataFrame (caso seja outro formato)
-            logger.info(f"Dados obtidos com sucesso: {len(response)} registros")
-            return pd.DataFrame(response)
+            logger.warning(f"Nenhum campo personalizado encontrado para o chunk {chunk_number}")
             
         except Exception as e:
-            logger.error(f"Erro ao obter dados da tabela crm_deal: {str(e)}")
-            return pd.DataFrame()
+            logger.error(f"Erro ao obter campos personalizados para o chunk {chunk_number}: {str(e)}")
+            # Continuar com o próximo chunk em caso de erro
+        
+        return pd.DataFrame()
     
-    def get_crm_deal_uf(self, deal_ids):
+    def get_crm_deal_uf(self, deal_ids, max_workers=None):
         """
         Obtém campos personalizados (UF) para os IDs de negócios especificados.
         
+        Os IDs são divididos em lotes de 100, buscados em paralelo por um pool
+        limitado de workers que compartilham a mesma sessão HTTP. Os resultados
+        são unidos na ordem original dos lotes.
+        
         Args:
             deal_ids: Lista de IDs de negócios para obter campos personalizados
+            max_workers: Limite de requisições simultâneas ou None para usar o do conector.
+                Use 1 para buscar os lotes sequencialmente.
             
         Returns:
             DataFrame com os campos personalizados ou um DataFrame vazio em caso de erro
@@ -396,72 +842,28 @@ class BitrixConnector:
         
         # Limitar a quantidade de IDs para evitar URLs muito longas
         chunk_size = 100
-        all_results = []
+        chunks = [deal_ids[i:i + chunk_size] for i in range(0, len(deal_ids), chunk_size)]
+        chunk_numbers = range(1, len(chunks) + 1)
         
-        for i in range(0, len(deal_ids), chunk_size):
-            chunk = deal_ids[i:i + chunk_size]
-            
-            # Formato de consulta baseado no exemplo fornecido, adaptado para crm_deal_uf
-            query_params = {
-                "dimensionsFilters": [
-                    [
-                        {
-                            "fieldName": "DEAL_ID",
-                            "values": chunk,
-                            "type": "INCLUDE",
-                            "operator": "EQUALS"
-                        }
-                    ]
-                ],
-                "fields": [
-                    { "name": "DEAL_ID" },
-                    { "name": "UF_CRM_1722605592778" }, # LINK_ARVORE
-                    { "name": "UF_CRM_1737689240946" }, # REUNIAO
-                    { "name": "UF_CRM_1740458137391" }  # DATA_FECHAMENTO
-                ],
-                "limit": 1000,
-                "offset": 0
-            }
-            
-            try:
-                logger.info(f"Buscando campos personalizados para {len(chunk)} negócios")
-                chunk_result = self._make_request("crm_deal_uf", query_params)
-                
-                if chunk_result:
-                    # Processar resposta em formato de matriz (array de arrays)
-                    if isinstance(chunk_result, list) and len(chunk_result) > 1:
-                        # Verificar se parece com matriz (primeiro elemento também é lista)
-                        if isinstance(chunk_result[0], list):
-                            logger.info("Resposta campos personalizados encontrada no formato de matriz")
-                            headers = chunk_result[0]  # Primeiro array são os cabeçalhos
-                            data = chunk_result[1:]    # Restante são os dados
-                            
-                            # Converter para lista de dicionários
-                            for row in data:
-                                if len(row) == len(headers):
-                                    record = dict(zip(headers, row))
-                                    all_results.append(record)
-                            
-                            logger.info(f"Convertidos {len(data)} registros de campos personalizados")
-                            continue  # Continuar para o próximo chunk
-                            
-                    # Se não for matriz, adicionar normalmente
-                    all_results.extend(chunk_result)
-                    logger.info(f"Obtidos {len(chunk_result)} registros de campos personalizados")
-                else:
-                    logger.warning(f"Nenhum campo personalizado encontrado para o chunk {i//chunk_size + 1}")
-                
-            except Exception as e:
-                logger.error(f"Erro ao obter campos personalizados para o chunk {i//chunk_size + 1}: {str(e)}")
-                # Continuar com o próximo chunk em caso de erro
+        workers = min(max_workers or self.max_workers, len(chunks))
+        
+        if workers <= 1:
+            chunk_results = [self._fetch_uf_chunk(chunk, n) for chunk, n in zip(chunks, chunk_numbers)]
+        else:
+            logger.info(f"Buscando {len(chunks)} lotes de campos personalizados com {workers} workers")
+            # executor.map preserva a ordem dos lotes na saída
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                chunk_results = list(executor.map(self._fetch_uf_chunk, chunks, chunk_numbers))
+        
+        frames = [frame for frame in chunk_results if not frame.empty]
         
-        if all_results:
-            return pd.DataFrame(all_results)
+        if frames:
+            return pd.concat(frames, ignore_index=True)
         else:
             logger.warning("Nenhum campo personalizado encontrado para todos os IDs fornecidos")
             return pd.DataFrame()
     
-    def get_combined_data(self, start_date, end_date, category_id=34):
+    def get_combined_data(self, start_date, end_date, category_id=34, time_filter_column="DATE_CREATE"):
         """
         Combina dados das tabelas crm_deal e crm_deal_uf.
         
@@ -469,13 +871,34 @@ class BitrixConnector:
             start_date: Data inicial no formato 'YYYY-MM-DD'
             end_date: Data final no formato 'YYYY-MM-DD'
             category_id: ID da categoria para filtrar (padrão: 34)
+            time_filter_column: Coluna de data usada no filtro do período. Use
+                'DATE_MODIFY' para obter apenas os negócios alterados no período.
             
         Returns:
-            DataFrame combinado ou None em caso de erro
+            DataFrame combinado ou um DataFrame vazio em caso de erro
+            
+        Raises:
+            BitrixFetchError: Se a busca for interrompida com dados incompletos
         """
         try:
-            # Obter dados da tabela crm_deal
-            df_deals = self.get_crm_deals(start_date, end_date, category_id)
+            # Obter dados da tabela crm_deal página a página. Os campos personalizados
+            # de cada página são buscados enquanto a próxima página é baixada.
+            deal_pages = []
+            uf_futures = []
+            with ThreadPoolExecutor(max_workers=1) as uf_executor:
+                for page in self.iter_crm_deals(start_date, end_date, category_id,
+                                                time_filter_column=time_filter_column):
+                    if "ID" not in page.columns and "id" in page.columns:
+                        page = page.rename(columns={"id": "ID"})
+                    deal_pages.append(page)
+                    
+                    if "ID" in page.columns and not page.empty:
+                        logger.info(f"Buscando campos personalizados para {len(page)} IDs")
+                        uf_futures.append(uf_executor.submit(self.get_crm_deal_uf, page["ID"].tolist()))
+                
+                uf_frames = [future.result() for future in uf_futures]
+            
+            df_deals = pd.concat(deal_pages, ignore_index=True) if deal_pages else pd.DataFrame()
             
             # Verificar se temos o campo ID
             if df_deals.empty:
@@ -496,12 +919,9 @@ class BitrixConnector:
             if not df_deals.empty and len(df_deals) > 0:
                 logger.info(f"Primeiros 2 registros da tabela crm_deal: {df_deals.head(2).to_dict('records')}")
             
-            # Extrair IDs dos negócios
-            deal_ids = df_deals["ID"].tolist()
-            
-            # Obter dados da tabela crm_deal_uf para esses IDs
-            logger.info(f"Buscando campos personalizados para {len(deal_ids)} IDs")
-            df_uf = self.get_crm_deal_uf(deal_ids)
+            # Unir os campos personalizados obtidos para cada página
+            uf_frames = [frame for frame in uf_frames if not frame.empty]
+            df_uf = pd.concat(uf_frames, ignore_index=True) if uf_frames else pd.DataFrame()
             
             if df_uf.empty:
                 logger.warning("Nenhum dado encontrado na tabela crm_deal_uf para os IDs fornecidos")
@@ -596,10 +1016,10 @@ class BitrixConnector:
                 logger.warning(f"Algumas colunas esperadas não foram encontradas no DataFrame combinado: {missing_columns}")
                 logger.info(f"Colunas disponíveis: {df_combined.columns.tolist()}")
             
-            # Formatação de datas para facilitar o uso posterior
+            # Converter as datas uma única vez, com formatos explícitos (ver schema.DATE_FORMATS)
             for date_col in ["DATE_CREATE", "DATE_MODIFY", "CLOSEDATE", "DATE_CREATE_uf", "CLOSEDATE_uf"]:
                 if date_col in df_combined.columns:
-                    df_combined[date_col] = pd.to_datetime(df_combined[date_col], errors='coerce')
+                    df_combined[date_col] = parse_datetime(df_combined[date_col])
             
             # Selecionar colunas para o DataFrame final
             columns_to_select = ["ID", "DATE_CREATE", "DATE_MODIFY", "ASSIGNED_BY_NAME", "STAGE_NAME"]
@@ -646,11 +1066,6 @@ class BitrixConnector:
             rename_mapping_filtered = {k: v for k, v in rename_mapping.items() if k in df_final.columns}
             df_final = df_final.rename(columns=rename_mapping_filtered)
             
-            # Formatar datas para string no formato DD/MM/YYYY HH:MM:SS
-            for col in ["Criado", "Modificado"]:
-                if col in df_final.columns and df_final[col].dtype == 'datetime64[ns]':
-                    df_final[col] = df_final[col].dt.strftime("%d/%m/%Y %H:%M:%S")
-            
             # Garantir que todas as colunas essenciais existam
             essential_columns = ["ID", "Responsável", "Fase"]
             for col in essential_columns:
@@ -659,6 +1074,9 @@ class BitrixConnector:
             
             return df_final
             
+        except BitrixFetchError:
+            # Dados parciais: quem chamou decide (ex: usar o último snapshot), sem guardar em cache
+            raise
         except Exception as e:
             logger.error(f"Erro ao combinar dados: {str(e)}")
             import traceback
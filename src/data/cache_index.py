@@ -0,0 +1,156 @@
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("CacheIndex")
+
+# Nome do arquivo do índice dentro do diretório de cache
+INDEX_FILENAME = "cache_index.sqlite"
+
+# Campos de cada entrada do índice
+INDEX_COLUMNS = (
+    "key", "file", "format", "timestamp", "accessed_at", "rows", "bytes",
+    "schema_version", "category_id", "start_date", "end_date", "metadata"
+)
+
+
+class CacheIndex:
+    """
+    Índice dos metadados do cache, em SQLite, guardado junto aos arquivos.
+
+    Cada chave registra o arquivo, o formato, o momento da gravação e do último
+    acesso, a quantidade de linhas, o tamanho em disco, a versão do esquema e a
+    janela de origem (categoria e período). Verificações de validade, listagens
+    e remoções consultam apenas o índice, sem ler os dados.
+    """
+
+    def __init__(self, cache_dir):
+        self.path = Path(cache_dir) / INDEX_FILENAME
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    file TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    accessed_at TEXT,
+                    rows INTEGER,
+                    bytes INTEGER,
+                    schema_version INTEGER,
+                    category_id TEXT,
+                    start_date TEXT,
+                    end_date TEXT,
+                    metadata TEXT
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Abre uma conexão curta com o índice (uma por operação, segura entre threads)."""
+        with self._lock:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    @staticmethod
+    def _to_dict(row):
+        """Converte uma linha do SQLite em dicionário, decodificando os metadados."""
+        entry = dict(row)
+        entry["metadata"] = json.loads(entry["metadata"]) if entry["metadata"] else {}
+        return entry
+
+    def upsert(self, key, file, file_format, timestamp, rows=None, size_bytes=None, metadata=None):
+        """
+        Registra ou atualiza a entrada de uma chave.
+
+        A versão do esquema e a janela de origem são lidas dos metadados
+        ('schema_version', 'category_id', 'start_date', 'end_date'), quando presentes.
+
+        Args:
+            key: Chave do cache
+            file: Nome do arquivo dentro do diretório de cache
+            file_format: Formato do arquivo ('arrow', 'parquet' ou 'pickle')
+            timestamp: Momento da gravação (ISO 8601)
+            rows: Quantidade de linhas dos dados, se conhecida
+            size_bytes: Tamanho do arquivo em disco
+            metadata: Metadados da entrada
+        """
+        metadata = metadata or {}
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO entries
+                    (key, file, format, timestamp, accessed_at, rows, bytes,
+                     schema_version, category_id, start_date, end_date, metadata)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    key, file, file_format, timestamp, timestamp, rows, size_bytes,
+                    metadata.get("schema_version"),
+                    None if metadata.get("category_id") is None else str(metadata["category_id"]),
+                    metadata.get("start_date"),
+                    metadata.get("end_date"),
+                    json.dumps(metadata, default=str),
+                )
+            )
+
+    def get(self, key):
+        """Retorna a entrada da chave ou None se ela não estiver no índice."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def touch(self, key):
+        """Registra um acesso à chave."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                (datetime.now().isoformat(), key)
+            )
+
+    def remove(self, key):
+        """Remove a chave do índice."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        """Remove todas as entradas do índice."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+
+    def entries(self, prefix=None):
+        """
+        Lista as entradas do índice, da mais recente para a mais antiga.
+
+        Args:
+            prefix: Prefixo das chaves a listar ou None para todas
+
+        Returns:
+            Lista de dicionários com os campos de INDEX_COLUMNS
+        """
+        with self._connect() as conn:
+            if prefix:
+                rows = conn.execute(
+                    "SELECT * FROM entries WHERE substr(key, 1, length(?)) = ? ORDER BY timestamp DESC",
+                    (prefix, prefix)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM entries ORDER BY timestamp DESC").fetchall()
+        return [self._to_dict(row) for row in rows]
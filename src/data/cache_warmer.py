@@ -0,0 +1,221 @@
+"""
+Pré-aquecimento do cache do Bitrix24
+
+Mantém no cache a janela padrão de cada categoria configurada, para que as
+sessões do dashboard quase nunca precisem buscar dados no Bitrix24. Roda em
+uma thread do próprio servidor (start_cache_warmer, chamado pelo app.py) ou
+em um processo separado:
+
+python -m src.data.cache_warmer [--once]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+from .bitrix_integration import BitrixIntegration
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("CacheWarmer")
+
+
+def _env_categories():
+    """Lê as categorias de BITRIX_WARM_CATEGORIES (separadas por vírgula) ou usa BITRIX_CATEGORY_ID."""
+    raw = os.environ.get("BITRIX_WARM_CATEGORIES") or os.environ.get("BITRIX_CATEGORY_ID", "34")
+    categories = []
+    for value in raw.split(","):
+        try:
+            categories.append(int(value.strip()))
+        except ValueError:
+            logger.warning(f"Categoria inválida em BITRIX_WARM_CATEGORIES: {value!r}")
+    return categories
+
+
+class CacheWarmer:
+    """
+    Agendador que carrega no cache a janela padrão de cada categoria.
+
+    Cada rodada verifica a entrada de cada categoria: se não existir, estiver
+    expirada ou for expirar antes das próximas duas rodadas, os dados são
+    buscados de novo. Em seguida, a limpeza do cache é executada (respeitando
+    o intervalo próprio de DataRepository.cleanup).
+
+    Configuração pelas variáveis de ambiente:
+        BITRIX_WARM_CATEGORIES: categorias separadas por vírgula (padrão: BITRIX_CATEGORY_ID)
+        BITRIX_WARM_INTERVAL_MINUTES: intervalo entre as rodadas (padrão: 15)
+        BITRIX_WARM_DAYS: dias da janela aquecida, até hoje (padrão: 90, a janela do dashboard)
+    """
+
+    def __init__(self, categories=None, interval_minutes=None, days=None, cache_dir="./cache"):
+        self.categories = categories if categories is not None else _env_categories()
+
+        try:
+            self.interval = float(interval_minutes if interval_minutes is not None
+                                  else os.environ.get("BITRIX_WARM_INTERVAL_MINUTES", 15)) * 60
+        except (ValueError, TypeError):
+            self.interval = 15 * 60
+
+        try:
+            self.days = int(days if days is not None else os.environ.get("BITRIX_WARM_DAYS", 90))
+        except (ValueError, TypeError):
+            self.days = 90
+
+        self.integration = BitrixIntegration(cache_dir=cache_dir)
+        self.runs = 0
+        self.last_run = None
+        self.last_results = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _needs_refresh(self, cache_key):
+        """Indica se a entrada não existe, expirou ou expira antes das próximas duas rodadas."""
+        repository = self.integration.repository
+        version = repository.cache_version(cache_key)
+        if version is None:
+            return True
+        expires_at = datetime.fromisoformat(version) + timedelta(hours=repository.cache_duration)
+        return expires_at - datetime.now() < timedelta(seconds=2 * self.interval)
+
+    def run_once(self):
+        """
+        Executa uma rodada de aquecimento para todas as categorias.
+
+        Returns:
+            Dicionário categoria -> 'fresh', 'refreshed' ou a mensagem de erro
+        """
+        end_date = datetime.now().strftime("%Y-%m-%d")
+        start_date = (datetime.now() - timedelta(days=self.days)).strftime("%Y-%m-%d")
+        results = {}
+
+        for category_id in self.categories:
+            try:
+                cache_key = self.integration.data_cache_key(start_date, end_date, category_id)
+                if not self._needs_refresh(cache_key):
+                    results[category_id] = "fresh"
+                    continue
+
+                started = time.perf_counter()
+                df = self.integration.get_data(
+                    start_date=start_date,
+                    end_date=end_date,
+                    category_id=category_id,
+                    force_refresh=True
+                )
+                # Sem resposta do Bitrix24, get_data devolve o último snapshot
+                source = (self.integration.last_load_info or {}).get("source")
+                if source != "bitrix":
+                    results[category_id] = f"Bitrix24 indisponível (dados de origem '{source}')"
+                    logger.warning(f"Categoria {category_id} não aquecida: Bitrix24 indisponível")
+                    continue
+                results[category_id] = "refreshed"
+                logger.info(
+                    f"Categoria {category_id} aquecida ({start_date} a {end_date}): "
+                    f"{len(df)} registros em {time.perf_counter() - started:.1f}s"
+                )
+            except Exception as e:
+                results[category_id] = str(e)
+                logger.error(f"Erro ao aquecer a categoria {category_id}: {str(e)}")
+
+        self.integration.repository.cleanup()
+
+        self.runs += 1
+        self.last_run = datetime.now()
+        self.last_results = results
+        return results
+
+    def _loop(self):
+        """Executa rodadas até stop() ser chamado."""
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Inicia o agendador em uma thread em segundo plano."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="cache-warmer", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Pré-aquecimento do cache iniciado: categorias {self.categories}, "
+            f"janela de {self.days} dias, a cada {self.interval / 60:.0f} minutos"
+        )
+
+    def stop(self):
+        """Interrompe o agendador após a rodada em andamento."""
+        self._stop.set()
+
+    def stats(self):
+        """Retorna o estado do agendador."""
+        return {
+            "categories": self.categories,
+            "interval_minutes": self.interval / 60,
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_results": self.last_results,
+        }
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def start_cache_warmer():
+    """
+    Inicia o agendador compartilhado por todo o processo, uma única vez.
+
+    O Streamlit executa o app.py a cada interação; as chamadas seguintes
+    retornam o agendador já em execução. Desativado com BITRIX_CACHE_WARMER=False
+    ou no modo CSV (USE_BITRIX_CSV=True).
+
+    Returns:
+        CacheWarmer em execução ou None se desativado
+    """
+    global _warmer
+
+    if os.environ.get("BITRIX_CACHE_WARMER", "True").lower() != "true":
+        return None
+    if os.environ.get("USE_BITRIX_CSV", "False").lower() == "true":
+        return None
+
+    with _warmer_lock:
+        if _warmer is None:
+            try:
+                _warmer = CacheWarmer()
+                _warmer.start()
+            except Exception as e:
+                logger.error(f"Não foi possível iniciar o pré-aquecimento do cache: {str(e)}")
+                _warmer = None
+        return _warmer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-aquecimento do cache do Bitrix24")
+    parser.add_argument("--once", action="store_true", help="Executa uma única rodada e encerra")
+    parser.add_argument("--cache-dir", default="./cache", help="Diretório de cache")
+    args = parser.parse_args()
+
+    warmer = CacheWarmer(cache_dir=args.cache_dir)
+    if args.once:
+        results = warmer.run_once()
+        failed = [category for category, result in results.items() if result not in ("fresh", "refreshed")]
+        sys.exit(1 if failed else 0)
+
+    logger.info(f"Aquecendo as categorias {warmer.categories} a cada {warmer.interval / 60:.0f} minutos")
+    try:
+        while True:
+            warmer.run_once()
+            time.sleep(warmer.interval)
+    except KeyboardInterrupt:
+        logger.info("Pré-aquecimento interrompido")
+
+
+if __name__ == "__main__":
+    main()
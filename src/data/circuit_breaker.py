@@ -0,0 +1,134 @@
+import os
+import time
+import logging
+import threading
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("CircuitBreaker")
+
+
+def _env_float(name, default):
+    """Lê um número da variável de ambiente, usando o valor padrão se ausente ou inválido."""
+    try:
+        return float(os.environ.get(name, default))
+    except (ValueError, TypeError):
+        return float(default)
+
+
+class CircuitBreaker:
+    """
+    Disjuntor para as chamadas ao Bitrix24.
+
+    Fechado, todas as requisições passam. Após failure_threshold falhas seguidas
+    ele abre e as requisições são recusadas imediatamente. Passados
+    recovery_timeout segundos, fica semiaberto e deixa passar uma única
+    requisição de teste: sucesso fecha o disjuntor, falha o abre de novo.
+
+    Configuração pelas variáveis de ambiente:
+        BITRIX_BREAKER_FAILURES: falhas seguidas para abrir (padrão: 5)
+        BITRIX_BREAKER_RECOVERY: segundos até a requisição de teste (padrão: 60)
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=None, recovery_timeout=None):
+        self.name = name
+        self.failure_threshold = int(failure_threshold if failure_threshold is not None
+                                     else _env_float("BITRIX_BREAKER_FAILURES", 5))
+        self.recovery_timeout = (recovery_timeout if recovery_timeout is not None
+                                 else _env_float("BITRIX_BREAKER_RECOVERY", 60))
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """
+        Indica se uma requisição pode ser enviada agora.
+
+        No estado semiaberto, apenas uma requisição de teste é liberada por vez.
+
+        Returns:
+            True se a requisição pode seguir, False se deve falhar imediatamente
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                logger.info(f"Disjuntor {self.name} semiaberto: enviando requisição de teste")
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        """Registra uma resposta do servidor e fecha o disjuntor."""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Disjuntor {self.name} fechado: o Bitrix24 voltou a responder")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """Registra uma falha de transporte e abre o disjuntor se o limite for atingido."""
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                if self.state == self.CLOSED:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                logger.warning(
+                    f"Disjuntor {self.name} aberto após {self.failures} falhas; "
+                    f"nova tentativa em {self.recovery_timeout:.0f}s"
+                )
+
+    def is_open(self):
+        """Indica se as requisições estão sendo recusadas neste momento."""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at < self.recovery_timeout
+            return self.state == self.HALF_OPEN and self._probe_in_flight
+
+    def stats(self):
+        """Retorna o estado atual do disjuntor."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "times_opened": self.times_opened,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name):
+    """
+    Retorna o disjuntor compartilhado por todo o processo para o nome informado
+    (normalmente a URL base do Bitrix24), criando-o na primeira chamada.
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
@@ -1,8 +1,13 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
 import re
+import os
+import time
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .schema import CATEGORIAS_FASE, TIMEZONE, require_datetime
 
 # Configuração de logging
 logging.basicConfig(
@@ -11,6 +16,66 @@ logging.basicConfig(
 )
 logger = logging.getLogger("DataProcessor")
 
+# Padrões do campo 'REUNIÃO': "DD/MM/YYYY, de HH:MM até HH:MM: DESCRIÇÃO, RESPONSÁVEL"
+# Ou: "hoje/amanhã, de HH:MM até HH:MM: DESCRIÇÃO, RESPONSÁVEL"
+MEETING_DATE_PATTERN = re.compile(r'(\d{2}/\d{2}/\d{4}|\bamanhã\b|\bhoje\b)')
+MEETING_TIME_PATTERN = re.compile(r'de\s+(\d{2}:\d{2})\s+até')
+MEETING_RESPONSIBLE_PATTERN = re.compile(r'(?:REUNIÃO|:)\s*,\s*([^,]+)$')
+
+# Registro das colunas derivadas: coluna -> (etapa que a calcula, colunas de entrada)
+DERIVED_COLUMNS = {
+    'data_reuniao': ('extract_meeting_details', ('REUNIÃO',)),
+    'hora_reuniao': ('extract_meeting_details', ('REUNIÃO',)),
+    'responsavel_reuniao': ('extract_meeting_details', ('REUNIÃO',)),
+    'grupo_link': ('clean_link_data', ('LINK ARVORE DA FAMÍLIA PLATAFORMA',)),
+    'total_duplicados': ('clean_link_data', ('LINK ARVORE DA FAMÍLIA PLATAFORMA',)),
+    'primeira_ocorrencia_link': ('clean_link_data', ('LINK ARVORE DA FAMÍLIA PLATAFORMA',)),
+    'ultima_ocorrencia_link': ('clean_link_data', ('LINK ARVORE DA FAMÍLIA PLATAFORMA',)),
+    'link_duplicado': ('clean_link_data', ('LINK ARVORE DA FAMÍLIA PLATAFORMA',)),
+    'categoria_fase': ('create_stage_categories', ('Fase', 'FECHADO')),
+    'tem_fechamento': ('create_stage_categories', ('Fase', 'FECHADO')),
+    'fase_fechamento': ('create_stage_categories', ('Fase', 'FECHADO')),
+    'FECHADO_dt': ('add_time_metrics', ('Criado', 'Modificado', 'FECHADO')),
+    'dias_aberto': ('add_time_metrics', ('Criado', 'Modificado', 'FECHADO')),
+    'dias_ate_fechamento': ('add_time_metrics', ('Criado', 'Modificado', 'FECHADO')),
+}
+
+# Ordem de execução das etapas
+STAGE_ORDER = ('extract_meeting_details', 'clean_link_data', 'create_stage_categories', 'add_time_metrics')
+
+# Etapas que dependem apenas da própria linha e podem rodar em blocos separados.
+# clean_link_data compara links entre todas as linhas e roda sobre o resultado completo.
+ROW_LOCAL_STAGES = ('extract_meeting_details', 'create_stage_categories', 'add_time_metrics')
+
+
+def _env_int(name, default):
+    """Lê um inteiro da variável de ambiente, usando o valor padrão se ausente ou inválido."""
+    try:
+        return int(os.environ.get(name, default))
+    except (ValueError, TypeError):
+        return default
+
+
+def _process_chunk(chunk, stages, references):
+    """
+    Executa as etapas por linha sobre um bloco do DataFrame (em um processo do pool).
+    
+    Args:
+        chunk: Bloco de linhas do DataFrame
+        stages: Nomes das etapas a executar, em ordem
+        references: Instante de referência por etapa, igual para todos os blocos
+        
+    Returns:
+        O bloco com as colunas derivadas
+    """
+    for name in stages:
+        stage = getattr(DataProcessor, name)
+        if name in references:
+            chunk = stage(chunk, copy=False, reference=references[name])
+        else:
+            chunk = stage(chunk, copy=False)
+    return chunk
+
 class DataProcessor:
     """
     Classe responsável pelo processamento dos dados extraídos do Bitrix24.
@@ -18,104 +83,154 @@ class DataProcessor:
     """
     
     @staticmethod
-    def extract_meeting_details(df):
+    def extract_meeting_details(df, reference=None, copy=True):
         """
         Extrai detalhes de reunião do campo 'REUNIÃO'.
         O formato esperado é: "DD/MM/YYYY, de HH:MM até HH:MM: DESCRIÇÃO, RESPONSÁVEL"
         
+        A extração é vetorizada (Series.str.extract com padrões pré-compilados).
+        "hoje" e "amanhã" são resolvidos em relação a um único instante de referência,
+        no fuso TIMEZONE, como as demais colunas de data.
+        
         Args:
             df: DataFrame com os dados extraídos
+            reference: Instante de referência para "hoje"/"amanhã" ou None para agora
+            copy: Se False, as colunas são adicionadas diretamente em df
             
         Returns:
-            DataFrame com colunas adicionais para data, hora e responsável da reunião
+            DataFrame com colunas adicionais para data (datetime64 com fuso TIMEZONE),
+            hora (timedelta64, desde a meia-noite) e responsável da reunião
         """
         if 'REUNIÃO' not in df.columns:
             logger.warning("Coluna 'REUNIÃO' não encontrada no DataFrame")
             return df
         
-        # Criar uma cópia para não modificar o original
-        df_result = df.copy()
+        # Criar uma cópia para não modificar o original (ou alterar no lugar se copy=False)
+        df_result = df.copy() if copy else df
         
-        # Extrair data, hora e responsável da reunião
-        def extract_info(meeting_str):
-            if not isinstance(meeting_str, str) or not meeting_str:
-                return pd.Series([None, None, None], index=['data_reuniao', 'hora_reuniao', 'responsavel_reuniao'])
-            
-            # Padrão: "DD/MM/YYYY, de HH:MM até HH:MM: DESCRIÇÃO, RESPONSÁVEL"
-            # Ou: "hoje/amanhã, de HH:MM até HH:MM: DESCRIÇÃO, RESPONSÁVEL"
-            
-            # Primeiro, tentar extrair a data
-            date_match = re.search(r'(\d{2}/\d{2}/\d{4}|\bamanhã\b|\bhoje\b)', meeting_str)
-            date = date_match.group(1) if date_match else None
-            
-            # Converter "hoje" e "amanhã" para datas reais
-            if date == 'hoje':
-                date = datetime.now().strftime('%d/%m/%Y')
-            elif date == 'amanhã':
-                date = (datetime.now() + timedelta(days=1)).strftime('%d/%m/%Y')
-            
-            # Extrair hora
-            time_match = re.search(r'de\s+(\d{2}:\d{2})\s+até', meeting_str)
-            time = time_match.group(1) if time_match else None
-            
-            # Extrair responsável
-            resp_match = re.search(r'(?:REUNIÃO|:)\s*,\s*([^,]+)$', meeting_str)
-            responsible = resp_match.group(1).strip() if resp_match else None
-            
-            return pd.Series([date, time, responsible], index=['data_reuniao', 'hora_reuniao', 'responsavel_reuniao'])
+        reunioes = df_result['REUNIÃO']
+        if not (pd.api.types.is_object_dtype(reunioes) or pd.api.types.is_string_dtype(reunioes)):
+            # Coluna sem nenhum texto (ex: totalmente vazia)
+            df_result['data_reuniao'] = pd.Series(pd.NaT, index=df_result.index, dtype=f'datetime64[ns, {TIMEZONE}]')
+            df_result['hora_reuniao'] = pd.Series(pd.NaT, index=df_result.index, dtype='timedelta64[ns]')
+            df_result['responsavel_reuniao'] = pd.Series(None, index=df_result.index, dtype=object)
+            return df_result
+        
+        # Valores que não são texto resultam em NaN no acessor .str
+        data_texto = reunioes.str.extract(MEETING_DATE_PATTERN, expand=False)
+        hora_texto = reunioes.str.extract(MEETING_TIME_PATTERN, expand=False)
+        responsavel = reunioes.str.extract(MEETING_RESPONSIBLE_PATTERN, expand=False).str.strip()
         
-        # Aplicar a função em todas as linhas
-        extracted_info = df_result['REUNIÃO'].apply(extract_info)
+        # Converter "hoje" e "amanhã" para datas reais, no fuso do portal
+        hoje = pd.Timestamp(reference) if reference is not None else pd.Timestamp.now(tz=TIMEZONE)
+        hoje = (hoje.tz_localize(TIMEZONE) if hoje.tz is None else hoje.tz_convert(TIMEZONE)).normalize()
+        data = pd.to_datetime(data_texto, format='%d/%m/%Y', errors='coerce')
+        data = data.dt.tz_localize(TIMEZONE, ambiguous='NaT', nonexistent='shift_forward')
+        data = data.mask(data_texto == 'hoje', hoje)
+        data = data.mask(data_texto == 'amanhã', hoje + pd.DateOffset(days=1))
         
-        # Adicionar as novas colunas ao DataFrame
-        df_result = pd.concat([df_result, extracted_info], axis=1)
+        df_result['data_reuniao'] = data
+        df_result['hora_reuniao'] = pd.to_timedelta(hora_texto + ':00', errors='coerce')
+        df_result['responsavel_reuniao'] = responsavel
         
         logger.info("Extração de detalhes de reunião concluída")
         return df_result
     
     @staticmethod
-    def clean_link_data(df):
+    def clean_link_data(df, copy=True):
         """
-        Limpa e padroniza os dados da coluna 'LINK ARVORE DA FAMÍLIA PLATAFORMA'.
+        Limpa e padroniza os dados da coluna 'LINK ARVORE DA FAMÍLIA PLATAFORMA'
+        e monta o índice de links duplicados.
+        
+        O índice é calculado uma única vez, em O(n), e guardado nas colunas:
+        - grupo_link: identificador do grupo de registros com o mesmo link (-1 sem link)
+        - total_duplicados: quantidade de registros do grupo (0 sem link)
+        - primeira_ocorrencia_link / ultima_ocorrencia_link: primeira e última linha do grupo
+        - link_duplicado: True se o link aparece em mais de um registro
         
         Args:
             df: DataFrame com os dados extraídos
+            copy: Se False, as colunas são alteradas diretamente em df
             
         Returns:
-            DataFrame com a coluna de link limpa
+            DataFrame com a coluna de link limpa e as colunas do índice de duplicados
         """
         if 'LINK ARVORE DA FAMÍLIA PLATAFORMA' not in df.columns:
             logger.warning("Coluna 'LINK ARVORE DA FAMÍLIA PLATAFORMA' não encontrada no DataFrame")
             return df
         
-        # Criar uma cópia para não modificar o original
-        df_result = df.copy()
+        # Criar uma cópia para não modificar o original (ou alterar no lugar se copy=False)
+        df_result = df.copy() if copy else df
         
-        # Limpar links vazios ou inválidos
-        df_result['LINK ARVORE DA FAMÍLIA PLATAFORMA'] = df_result['LINK ARVORE DA FAMÍLIA PLATAFORMA'].apply(
-            lambda x: x if isinstance(x, str) and len(x) > 5 else ""
-        )
+        # Limpar links vazios ou inválidos (valores que não são texto viram NaN no acessor .str)
+        links = df_result['LINK ARVORE DA FAMÍLIA PLATAFORMA']
+        if pd.api.types.is_object_dtype(links) or pd.api.types.is_string_dtype(links):
+            links = links.where(links.str.len() > 5, "").fillna("")
+        else:
+            links = pd.Series("", index=df_result.index, dtype=object)
+        df_result['LINK ARVORE DA FAMÍLIA PLATAFORMA'] = links
         
-        # Identificar links duplicados
-        link_counts = df_result['LINK ARVORE DA FAMÍLIA PLATAFORMA'].value_counts()
-        duplicated_links = link_counts[link_counts > 1].index.tolist()
-        duplicated_links = [link for link in duplicated_links if link]  # Remover links vazios
+        # Agrupar registros com o mesmo link
+        tem_link = (links != "").to_numpy(dtype=bool)
+        codigos, _ = pd.factorize(links.where(tem_link))
+        tamanhos_grupo = np.bincount(codigos[tem_link], minlength=codigos.max() + 1 if tem_link.any() else 0)
+        total = np.zeros(len(codigos), dtype=np.int64)
+        total[tem_link] = tamanhos_grupo[codigos[tem_link]]
+        
+        df_result['grupo_link'] = codigos
+        df_result['total_duplicados'] = total
+        df_result['primeira_ocorrencia_link'] = tem_link & ~links.duplicated(keep='first').to_numpy()
+        df_result['ultima_ocorrencia_link'] = tem_link & ~links.duplicated(keep='last').to_numpy()
         
         # Marcar links duplicados
-        df_result['link_duplicado'] = df_result['LINK ARVORE DA FAMÍLIA PLATAFORMA'].apply(
-            lambda x: True if x in duplicated_links else False
-        )
+        df_result['link_duplicado'] = total > 1
         
-        logger.info(f"Identificados {len(duplicated_links)} links duplicados")
+        logger.info(f"Identificados {int((tamanhos_grupo > 1).sum())} links duplicados")
         return df_result
     
     @staticmethod
-    def create_stage_categories(df):
+    def duplicate_index(df):
+        """
+        Resume o índice de links duplicados por link.
+        
+        Usa as colunas calculadas por clean_link_data, calculando-as sob demanda
+        (em df) se ainda não existirem.
+        
+        Args:
+            df: DataFrame com os dados extraídos ou processados
+            
+        Returns:
+            DataFrame indexado por grupo_link com as colunas 'link', 'tamanho',
+            'primeira_ocorrencia' e 'ultima_ocorrencia' (posições das linhas em df)
+        """
+        if 'grupo_link' not in df.columns:
+            df = DataProcessor.ensure_columns(df, ['grupo_link'])
+            if 'grupo_link' not in df.columns:
+                return pd.DataFrame(columns=['link', 'tamanho', 'primeira_ocorrencia', 'ultima_ocorrencia'])
+        
+        codigos = df['grupo_link'].to_numpy()
+        com_link = codigos >= 0
+        grupos = pd.DataFrame({
+            'grupo_link': codigos[com_link],
+            'link': df['LINK ARVORE DA FAMÍLIA PLATAFORMA'].to_numpy()[com_link],
+            'posicao': np.flatnonzero(com_link)
+        })
+        
+        return grupos.groupby('grupo_link').agg(
+            link=('link', 'first'),
+            tamanho=('posicao', 'size'),
+            primeira_ocorrencia=('posicao', 'min'),
+            ultima_ocorrencia=('posicao', 'max')
+        )
+    
+    @staticmethod
+    def create_stage_categories(df, copy=True):
         """
         Categoriza as fases em grupos lógicos para análise.
         
         Args:
             df: DataFrame com os dados extraídos
+            copy: Se False, as colunas são alteradas diretamente em df
             
         Returns:
             DataFrame com coluna adicional de categoria de fase
@@ -124,8 +239,8 @@ class DataProcessor:
             logger.warning("Coluna 'Fase' não encontrada no DataFrame")
             return df
         
-        # Criar uma cópia para não modificar o original
-        df_result = df.copy()
+        # Criar uma cópia para não modificar o original (ou alterar no lugar se copy=False)
+        df_result = df.copy() if copy else df
         
         # Definir categorias de fases
         assinatura_fases = ['ASSINADO', 'EM ASSINATURA', 'VALIDADO ENVIAR FINANCEIRO']
@@ -138,6 +253,7 @@ class DataProcessor:
         df_result.loc[df_result['Fase'].isin(assinatura_fases), 'categoria_fase'] = 'Assinatura'
         df_result.loc[df_result['Fase'].isin(negociacao_fases), 'categoria_fase'] = 'Negociação'
         df_result.loc[df_result['Fase'].isin(reuniao_fases), 'categoria_fase'] = 'Reunião'
+        df_result['categoria_fase'] = pd.Categorical(df_result['categoria_fase'], categories=CATEGORIAS_FASE)
         
         # Criar flag de fechamento
         df_result['tem_fechamento'] = df_result['FECHADO'].apply(lambda x: False if pd.isna(x) or x == '' else True)
@@ -149,33 +265,36 @@ class DataProcessor:
         return df_result
     
     @staticmethod
-    def add_time_metrics(df):
+    def add_time_metrics(df, copy=True, reference=None):
         """
         Adiciona métricas de tempo como tempo em cada fase, etc.
         
         Args:
-            df: DataFrame com os dados extraídos
+            df: DataFrame com os dados extraídos, com Criado, Modificado e FECHADO
+                já em datetime64 (schema.enforce_schema)
+            copy: Se False, as colunas são alteradas diretamente em df
+            reference: Instante usado como "agora" ou None para o instante atual
             
         Returns:
             DataFrame com métricas de tempo adicionadas
+            
+        Raises:
+            TypeError: Se as colunas de data não estiverem em datetime64
         """
         if not all(col in df.columns for col in ['Criado', 'Modificado', 'FECHADO']):
             logger.warning("Colunas necessárias para métricas de tempo não encontradas")
             return df
         
-        # Criar uma cópia para não modificar o original
-        df_result = df.copy()
+        # As datas já chegam convertidas pelo esquema; não são convertidas de novo aqui
+        require_datetime(df, ['Criado', 'Modificado', 'FECHADO'])
         
-        # Converter colunas para datetime se ainda não estiverem
-        for col in ['Criado', 'Modificado']:
-            if df_result[col].dtype != 'datetime64[ns]':
-                df_result[col] = pd.to_datetime(df_result[col], errors='coerce')
+        # Criar uma cópia para não modificar o original (ou alterar no lugar se copy=False)
+        df_result = df.copy() if copy else df
         
-        # Converter FECHADO para datetime, tratando valores vazios
-        df_result['FECHADO_dt'] = pd.to_datetime(df_result['FECHADO'], errors='coerce')
+        df_result['FECHADO_dt'] = df_result['FECHADO']
         
         # Calcular tempo desde a criação até agora (para negócios em andamento)
-        now = datetime.now()
+        now = pd.Timestamp(reference) if reference is not None else pd.Timestamp.now(tz=df_result['Criado'].dt.tz)
         df_result['dias_aberto'] = (now - df_result['Criado']).dt.total_seconds() / (24 * 3600)
         
         # Calcular tempo até o fechamento (para negócios fechados)
@@ -194,27 +313,187 @@ class DataProcessor:
         return df_result
     
     @staticmethod
-    def process_data(df):
+    def stages_for(columns=None):
+        """
+        Retorna as etapas necessárias para calcular as colunas derivadas informadas.
+        
+        Args:
+            columns: Colunas derivadas desejadas ou None para todas
+            
+        Returns:
+            Lista com os nomes das etapas, na ordem de execução
+        """
+        if columns is None:
+            return list(STAGE_ORDER)
+        
+        unknown = [col for col in columns if col not in DERIVED_COLUMNS]
+        if unknown:
+            raise ValueError(f"Colunas derivadas desconhecidas: {unknown}")
+        
+        needed = {DERIVED_COLUMNS[col][0] for col in columns}
+        return [stage for stage in STAGE_ORDER if stage in needed]
+    
+    @staticmethod
+    def ensure_columns(df, columns):
+        """
+        Garante que as colunas derivadas pedidas existam, calculando-as sob demanda.
+        
+        Apenas as etapas das colunas ainda ausentes são executadas, diretamente
+        em df, e derivações não pedidas não custam nada. As colunas ficam apenas
+        neste DataFrame: para dados em memória compartilhada use
+        BitrixIntegration.ensure_columns, que as calcula uma vez por versão.
+        
+        Args:
+            df: DataFrame com os dados extraídos (alterado no lugar)
+            columns: Lista de colunas derivadas necessárias (chaves de DERIVED_COLUMNS)
+            
+        Returns:
+            O próprio df, com as colunas calculadas
+        """
+        missing = [col for col in columns if col not in df.columns]
+        if not missing or df.empty:
+            return df
+        
+        for stage in DataProcessor.stages_for(missing):
+            inputs = {
+                col for derived, (owner, cols) in DERIVED_COLUMNS.items()
+                if owner == stage for col in cols
+            }
+            if not inputs.issubset(df.columns):
+                logger.warning(f"Etapa {stage} ignorada: colunas de entrada ausentes {sorted(inputs - set(df.columns))}")
+                continue
+            logger.info(f"Calculando sob demanda a etapa {stage}")
+            df = getattr(DataProcessor, stage)(df, copy=False)
+        
+        return df
+    
+    @staticmethod
+    def _use_parallel(df, parallel):
+        """
+        Decide se o processamento em blocos compensa o custo de iniciar os processos.
+        
+        Configuração pelas variáveis de ambiente:
+            BITRIX_PARALLEL_PROCESSING: ativa o modo paralelo (padrão: False)
+            BITRIX_PARALLEL_MIN_ROWS: linhas mínimas para usar o modo paralelo (padrão: 200000)
+        """
+        if parallel is None:
+            parallel = os.environ.get("BITRIX_PARALLEL_PROCESSING", "False").lower() == "true"
+        if not parallel:
+            return False
+        return len(df) >= _env_int("BITRIX_PARALLEL_MIN_ROWS", 200000)
+    
+    @staticmethod
+    def _run_parallel(df, stages, workers=None):
+        """
+        Executa as etapas por linha em blocos, num pool de processos.
+        
+        Todas as etapas recebem o mesmo instante de referência, para que "hoje" e
+        "agora" sejam iguais em todos os blocos.
+        
+        Args:
+            df: DataFrame completo (não é alterado)
+            stages: Etapas por linha a executar (ver ROW_LOCAL_STAGES)
+            workers: Número de processos ou None para BITRIX_PROCESS_WORKERS
+                (padrão: número de CPUs)
+            
+        Returns:
+            Novo DataFrame com as colunas derivadas, na ordem original das linhas
+        """
+        if workers is None:
+            workers = _env_int("BITRIX_PROCESS_WORKERS", os.cpu_count() or 1)
+        workers = max(1, min(workers, len(df)))
+        
+        references = {'extract_meeting_details': pd.Timestamp.now(tz=TIMEZONE)}
+        if 'Criado' in df.columns and pd.api.types.is_datetime64_any_dtype(df['Criado']):
+            references['add_time_metrics'] = pd.Timestamp.now(tz=df['Criado'].dt.tz)
+        
+        limites = np.linspace(0, len(df), workers + 1, dtype=int)
+        chunks = [df.iloc[inicio:fim] for inicio, fim in zip(limites[:-1], limites[1:])]
+        logger.info(f"Processando {len(df)} linhas em {len(chunks)} blocos paralelos")
+        
+        # spawn: o processo do Streamlit tem várias threads, o que torna o fork inseguro
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=contexto) as executor:
+            resultados = list(executor.map(
+                _process_chunk, chunks, [stages] * len(chunks), [references] * len(chunks)
+            ))
+        
+        return pd.concat(resultados)
+    
+    @staticmethod
+    def process_data(df, copy=True, return_stats=False, columns=None, parallel=None):
         """
         Aplica todas as transformações necessárias aos dados.
         
+        As etapas trabalham sobre um único DataFrame: no máximo uma cópia é feita
+        no início (nenhuma com copy=False) e cada etapa adiciona suas colunas no
+        lugar, de modo que o pico de memória fica próximo de 1x o conjunto de dados.
+        
         Args:
             df: DataFrame com os dados brutos extraídos do Bitrix24
+            copy: Se False, df é alterado no lugar (use quando o chamador é dono do DataFrame)
+            return_stats: Se True, retorna também o tempo e a variação de memória de cada etapa
+            columns: Colunas derivadas desejadas (chaves de DERIVED_COLUMNS); apenas as
+                etapas necessárias são executadas. None executa todas as etapas
+            parallel: Se True, conjuntos com pelo menos BITRIX_PARALLEL_MIN_ROWS linhas
+                têm as etapas por linha executadas em blocos num pool de processos, e
+                a detecção de duplicados roda depois sobre o resultado completo. Se
+                None, será lido da variável de ambiente BITRIX_PARALLEL_PROCESSING
             
         Returns:
-            DataFrame processado e pronto para análise
+            DataFrame processado e pronto para análise, ou tupla (DataFrame, estatísticas)
+            se return_stats=True. As estatísticas são uma lista de dicionários com
+            'stage', 'seconds' e 'memory_delta_bytes'.
         """
+        stats = []
+        
         if df.empty:
             logger.warning("DataFrame vazio, nenhum processamento será aplicado")
-            return df
+            return (df, stats) if return_stats else df
         
         logger.info("Iniciando processamento completo dos dados")
         
-        # Aplicar todas as transformações em sequência
-        df = DataProcessor.extract_meeting_details(df)
-        df = DataProcessor.clean_link_data(df)
-        df = DataProcessor.create_stage_categories(df)
-        df = DataProcessor.add_time_metrics(df)
+        names = DataProcessor.stages_for(columns)
+        
+        if any(name in ROW_LOCAL_STAGES for name in names) and DataProcessor._use_parallel(df, parallel):
+            # Os blocos são copiados para os processos; o resultado já é um novo DataFrame
+            row_local = [name for name in names if name in ROW_LOCAL_STAGES]
+            names = [name for name in names if name not in ROW_LOCAL_STAGES]
+            
+            memory_before = df.memory_usage(deep=True).sum() if return_stats else 0
+            started = time.perf_counter()
+            
+            df = DataProcessor._run_parallel(df, row_local)
+            
+            elapsed = time.perf_counter() - started
+            if return_stats:
+                stats.append({
+                    "stage": "parallel:" + ",".join(row_local),
+                    "seconds": round(elapsed, 4),
+                    "memory_delta_bytes": int(df.memory_usage(deep=True).sum() - memory_before)
+                })
+            logger.info(f"Etapas por linha concluídas em paralelo em {elapsed:.3f}s")
+        elif copy:
+            # DataFrame de propriedade do pipeline
+            df = df.copy()
+        
+        stages = [(name, getattr(DataProcessor, name)) for name in names]
+        
+        # Aplicar as transformações restantes em sequência
+        for name, stage in stages:
+            memory_before = df.memory_usage(deep=True).sum() if return_stats else 0
+            started = time.perf_counter()
+            
+            df = stage(df, copy=False)
+            
+            elapsed = time.perf_counter() - started
+            if return_stats:
+                stats.append({
+                    "stage": name,
+                    "seconds": round(elapsed, 4),
+                    "memory_delta_bytes": int(df.memory_usage(deep=True).sum() - memory_before)
+                })
+            logger.info(f"Etapa {name} concluída em {elapsed:.3f}s")
         
         logger.info("Processamento completo dos dados concluído")
-        return df 
\ No newline at end of file
+        return (df, stats) if return_stats else df
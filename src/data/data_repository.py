@@ -1,11 +1,31 @@
 import pandas as pd
 import os
 import json
+import hashlib
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import logging
 import pickle
+import threading
+import time
 from pathlib import Path
 
+from .cache_index import CacheIndex, INDEX_COLUMNS
+
+# Formatos colunares (Arrow IPC e Parquet) exigem o pyarrow
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Travas de arquivo entre processos (POSIX); no Windows, as travas valem apenas dentro do processo
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -13,35 +33,185 @@ logging.basicConfig(
 )
 logger = logging.getLogger("DataRepository")
 
+# Extensão dos arquivos de cache por formato, na ordem de preferência de leitura
+CACHE_EXTENSIONS = {"arrow": ".arrow", "parquet": ".parquet", "pickle": ".pkl"}
+
+# Compressões aceitas pelos formatos colunares
+CACHE_COMPRESSIONS = ("zstd", "lz4", "uncompressed")
+
+# Chave, nos metadados do esquema Arrow, com o timestamp e os metadados da entrada
+ENTRY_METADATA_KEY = b"cache_entry"
+
+# Subdiretório do cache com os arquivos de trava de cada chave
+LOCK_DIRNAME = ".locks"
+
+# Arquivos temporários abandonados (ex: processo encerrado durante a gravação) são removidos após este prazo
+TEMP_MAX_AGE_SECONDS = 3600
+
+# Travas de chave mantidas pela thread atual (permite reentrância)
+_held_locks = threading.local()
+
+# Estatísticas de limpeza por diretório de cache, compartilhadas por todo o processo
+_cleanup_stats = {}
+_cleanup_lock = threading.Lock()
+
+
+def _env_float(name, default):
+    """Lê um número da variável de ambiente, usando o valor padrão se ausente ou inválido."""
+    try:
+        return float(os.environ.get(name, default))
+    except (ValueError, TypeError):
+        return float(default)
+
+def _file_checksum(path):
+    """Calcula o checksum (BLAKE2b) do conteúdo de um arquivo."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _FileLock:
+    """
+    Trava exclusiva (advisory) sobre um arquivo.
+    
+    Com fcntl, usa flock e vale entre processos e entre threads; sem fcntl
+    (Windows), usa um threading.Lock por arquivo e vale apenas dentro do processo.
+    """
+    
+    _local_locks = {}
+    _local_guard = threading.Lock()
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self._handle = None
+        self._local = None
+    
+    def acquire(self, timeout):
+        """Tenta obter a trava por até timeout segundos; retorna True se conseguiu."""
+        if fcntl is None:
+            with _FileLock._local_guard:
+                lock = _FileLock._local_locks.setdefault(str(self.path), threading.Lock())
+            if lock.acquire(timeout=timeout):
+                self._local = lock
+                return True
+            return False
+        
+        deadline = time.monotonic() + timeout
+        self._handle = open(self.path, "a")
+        while True:
+            try:
+                fcntl.flock(self._handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    self._handle.close()
+                    self._handle = None
+                    return False
+                time.sleep(0.1)
+    
+    def release(self):
+        """Libera a trava."""
+        if self._handle is not None:
+            fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+        if self._local is not None:
+            self._local.release()
+            self._local = None
+
+
 class DataRepository:
     """
     Classe responsável pelo armazenamento, cache e recuperação de dados.
     Gerencia o ciclo de vida dos dados, incluindo persistência e expiração de cache.
     """
     
-    def __init__(self, cache_dir="./cache", cache_duration=12):
+    def __init__(self, cache_dir="./cache", cache_duration=12, cache_format=None, compression=None,
+                 max_bytes=None, max_entries=None, retention_days=None, backup_dir="./backups"):
         """
         Inicializa o repositório de dados.
         
         Args:
             cache_dir: Diretório onde os dados em cache serão armazenados
             cache_duration: Duração do cache em horas
+            cache_format: 'arrow' (Arrow IPC), 'parquet' ou 'pickle'. Se None, será lido
+                da variável de ambiente CACHE_FORMAT (padrão: 'arrow' com o pyarrow
+                instalado, 'pickle' caso contrário)
+            compression: Compressão dos formatos colunares: 'zstd', 'lz4' ou
+                'uncompressed' (leitura mapeada em memória sem cópia). Se None, será
+                lida da variável de ambiente CACHE_COMPRESSION (padrão: 'zstd')
+            max_bytes: Tamanho máximo do cache em bytes ou None para CACHE_MAX_MB (padrão: 1024 MB)
+            max_entries: Quantidade máxima de entradas ou None para CACHE_MAX_ENTRIES (padrão: 500)
+            retention_days: Dias sem acesso após os quais uma entrada é removida, ou None
+                para CACHE_RETENTION_DAYS (padrão: 30). Vale também para os backups
+            backup_dir: Diretório dos backups criados por backup_data
         """
         self.cache_dir = Path(cache_dir)
         self.cache_duration = cache_duration
         
+        if cache_format is None:
+            cache_format = os.environ.get("CACHE_FORMAT", "arrow" if pa is not None else "pickle")
+        cache_format = cache_format.lower()
+        if cache_format not in CACHE_EXTENSIONS:
+            logger.warning(f"Formato de cache desconhecido: {cache_format}; usando pickle")
+            cache_format = "pickle"
+        if cache_format != "pickle" and pa is None:
+            logger.warning("pyarrow não instalado: o cache usará pickle")
+            cache_format = "pickle"
+        self.cache_format = cache_format
+        
+        if compression is None:
+            compression = os.environ.get("CACHE_COMPRESSION", "zstd")
+        compression = compression.lower()
+        if compression not in CACHE_COMPRESSIONS:
+            logger.warning(f"Compressão desconhecida: {compression}; usando zstd")
+            compression = "zstd"
+        self.compression = compression
+        
+        # Limites do cache; acima deles, as entradas acessadas há mais tempo são removidas
+        self.max_bytes = int(max_bytes if max_bytes is not None else _env_float("CACHE_MAX_MB", 1024) * 1024 ** 2)
+        self.max_entries = int(max_entries if max_entries is not None else _env_float("CACHE_MAX_ENTRIES", 500))
+        self.retention_days = retention_days if retention_days is not None else _env_float("CACHE_RETENTION_DAYS", 30)
+        self.max_backups = int(_env_float("BACKUP_MAX_FILES", 20))
+        self.cleanup_interval = _env_float("CACHE_CLEANUP_MINUTES", 60) * 60
+        self.backup_dir = Path(backup_dir)
+        
+        # Gravação concorrente: espera máxima pela trava da chave e conferência do checksum na leitura
+        self.lock_timeout = _env_float("CACHE_LOCK_TIMEOUT", 300)
+        self.verify_checksum = os.environ.get("CACHE_VERIFY_CHECKSUM", "True").lower() == "true"
+        
         # Criar diretório de cache se não existir
         if not self.cache_dir.exists():
             self.cache_dir.mkdir(parents=True, exist_ok=True)
             logger.info(f"Diretório de cache criado: {self.cache_dir}")
+        self.lock_dir = self.cache_dir / LOCK_DIRNAME
+        self.lock_dir.mkdir(exist_ok=True)
+        
+        # Índice de metadados: validade, listagem e remoção sem ler os dados
+        self.index = CacheIndex(self.cache_dir)
+        self._sync_index()
+        
+        # Limpeza periódica (no máximo uma vez a cada cleanup_interval por processo)
+        self.cleanup()
     
-    def save_to_cache(self, data, cache_key):
+    def save_to_cache(self, data, cache_key, metadata=None, timestamp=None):
         """
         Salva os dados em cache com uma chave específica.
         
+        A gravação é atômica: o arquivo é escrito em um temporário e renomeado
+        sobre o definitivo, com a trava da chave adquirida. O checksum, o tamanho
+        e a data de modificação do arquivo ficam no índice; o checksum é conferido
+        na leitura apenas se o arquivo mudou ou não pôde ser lido.
+        
         Args:
             data: Dados a serem armazenados em cache (geralmente um DataFrame)
             cache_key: Chave única para identificar os dados em cache
+            metadata: Dicionário opcional com metadados guardados junto aos dados
+            timestamp: Momento dos dados (ISO 8601), que define a validade da entrada,
+                ou None para agora. Dados montados a partir de outras entradas usam o
+                da mais antiga, para não prolongar a validade delas
             
         Returns:
             bool: True se os dados foram salvos com sucesso, False caso contrário
@@ -51,54 +221,94 @@ class DataRepository:
             return False
         
         try:
-            # Caminho do arquivo de cache
-            cache_path = self.cache_dir / f"{cache_key}.pkl"
-            
             # Criar estrutura de dados com metadados
             cache_data = {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp or datetime.now().isoformat(),
+                "metadata": metadata or {},
                 "data": data
             }
             
-            # Salvar usando pickle para preservar tipos de dados do pandas
-            with open(cache_path, 'wb') as f:
-                pickle.dump(cache_data, f)
+            with self.lock(cache_key):
+                # DataFrames vão para o formato colunar; o pickle fica como alternativa
+                cache_format = self.cache_format if isinstance(data, pd.DataFrame) else "pickle"
+                cache_path = self.cache_dir / f"{cache_key}{CACHE_EXTENSIONS[cache_format]}"
+                checksum = None
+                if cache_format != "pickle":
+                    try:
+                        checksum = self._atomic_write(
+                            cache_path,
+                            lambda path: self._write_columnar(cache_data, path, cache_format)
+                        )
+                    except (pa.ArrowException, TypeError, ValueError) as e:
+                        logger.warning(f"Não foi possível salvar {cache_key} em {cache_format} ({str(e)}); usando pickle")
+                        cache_format = "pickle"
+                        cache_path = self.cache_dir / f"{cache_key}.pkl"
+                
+                if cache_format == "pickle":
+                    # Salvar usando pickle para preservar tipos de dados do pandas
+                    checksum = self._atomic_write(cache_path, lambda path: self._write_pickle(cache_data, path))
+                
+                # Remover versões da mesma chave em outros formatos
+                for stale in self._cache_files(cache_key):
+                    if stale != cache_path:
+                        os.remove(stale)
+                
+                file_stat = cache_path.stat()
+                self.index.upsert(
+                    cache_key,
+                    cache_path.name,
+                    cache_format,
+                    cache_data["timestamp"],
+                    rows=len(data) if hasattr(data, "__len__") else None,
+                    size_bytes=file_stat.st_size,
+                    metadata={**cache_data["metadata"], "checksum": checksum, "mtime_ns": file_stat.st_mtime_ns}
+                )
+            
+            # Manter o cache dentro dos limites, sem remover a entrada recém-gravada
+            self._evict_lru(protect=cache_key)
             
-            logger.info(f"Dados salvos em cache: {cache_key}")
+            logger.info(f"Dados salvos em cache: {cache_key} ({cache_format})")
             return True
             
         except Exception as e:
             logger.error(f"Erro ao salvar dados em cache: {str(e)}")
             return False
     
-    def load_from_cache(self, cache_key):
+    def load_from_cache(self, cache_key, columns=None):
         """
         Carrega dados do cache se estiverem disponíveis e dentro do prazo de validade.
         
+        A validade é verificada pelo índice, antes de abrir o arquivo. Nos formatos
+        colunares, apenas as colunas pedidas são lidas.
+        
         Args:
             cache_key: Chave única para identificar os dados em cache
+            columns: Colunas a carregar ou None para todas
             
         Returns:
             Os dados armazenados em cache ou None se não estiverem disponíveis ou expirados
         """
-        cache_path = self.cache_dir / f"{cache_key}.pkl"
-        
-        if not cache_path.exists():
-            logger.info(f"Cache não encontrado: {cache_key}")
-            return None
-        
         try:
-            with open(cache_path, 'rb') as f:
-                cache_data = pickle.load(f)
+            entry = self._index_entry(cache_key)
             
-            # Verificar validade do cache
-            cached_time = datetime.fromisoformat(cache_data["timestamp"])
-            expiration_time = cached_time + timedelta(hours=self.cache_duration)
+            if entry is None:
+                logger.info(f"Cache não encontrado: {cache_key}")
+                return None
             
-            if datetime.now() > expiration_time:
+            # Verificar validade do cache
+            if self._is_expired(entry):
                 logger.info(f"Cache expirado: {cache_key}")
                 return None
             
+            entry = self._verified_entry(entry)
+            if entry is None:
+                return None
+            
+            cache_data = self._read_verified(entry, columns)
+            if cache_data is None:
+                return None
+            self.index.touch(cache_key)
+            
             logger.info(f"Dados carregados do cache: {cache_key}")
             return cache_data["data"]
             
@@ -106,6 +316,569 @@ class DataRepository:
             logger.error(f"Erro ao carregar dados do cache: {str(e)}")
             return None
     
+    def load_cache_entry(self, cache_key, columns=None):
+        """
+        Carrega uma entrada do cache completa, sem verificar a validade.
+        
+        Args:
+            cache_key: Chave única para identificar os dados em cache
+            columns: Colunas a carregar ou None para todas
+            
+        Returns:
+            Dicionário com 'timestamp', 'metadata' e 'data' ou None se não existir
+        """
+        try:
+            entry = self._index_entry(cache_key)
+            if entry is not None:
+                entry = self._verified_entry(entry)
+            if entry is None:
+                return None
+            
+            cache_data = self._read_verified(entry, columns)
+            if cache_data is None:
+                return None
+            self.index.touch(cache_key)
+            return cache_data
+            
+        except Exception as e:
+            logger.error(f"Erro ao carregar entrada do cache: {str(e)}")
+            return None
+    
+    def find_latest_entry(self, prefix, **params):
+        """
+        Localiza a entrada de cache mais recente com o prefixo e parâmetros informados,
+        mesmo que já esteja expirada.
+        
+        Args:
+            prefix: Prefixo usado em generate_cache_key
+            **params: Parâmetros que a chave deve conter (os demais são ignorados)
+            
+        Returns:
+            Dicionário com 'timestamp', 'metadata' e 'data' ou None se nada for encontrado
+        """
+        tokens = [f"_{k}={v}_" for k, v in params.items()]
+        
+        # Da entrada mais recente para a mais antiga (pelo índice), ignorando as ilegíveis
+        for indexed in self.index.entries(prefix=f"{prefix}_"):
+            if not all(token in f"_{indexed['key']}_" for token in tokens):
+                continue
+            entry = self.load_cache_entry(indexed["key"])
+            if entry is not None:
+                return entry
+        
+        return None
+    
+    def find_range_entries(self, prefix, category_id, start_date, end_date, include_expired=False, **metadata):
+        """
+        Localiza, pelo índice, as entradas da categoria cuja janela se sobrepõe ao período.
+        
+        Args:
+            prefix: Prefixo usado em generate_cache_key
+            category_id: ID da categoria
+            start_date: Data inicial no formato 'YYYY-MM-DD'
+            end_date: Data final no formato 'YYYY-MM-DD'
+            include_expired: Se True, considera também entradas expiradas
+            **metadata: Valores que os metadados da entrada devem ter (ex: processed=True)
+            
+        Returns:
+            Lista de entradas do índice, da mais recente para a mais antiga
+        """
+        result = []
+        for entry in self.index.entries(prefix=f"{prefix}_"):
+            if entry["category_id"] != str(category_id) or not entry["start_date"] or not entry["end_date"]:
+                continue
+            if entry["end_date"] < start_date or entry["start_date"] > end_date:
+                continue
+            if not include_expired and self._is_expired(entry):
+                continue
+            if any(entry["metadata"].get(k) != v for k, v in metadata.items()):
+                continue
+            result.append(entry)
+        return result
+    
+    def is_fresh(self, cache_key):
+        """
+        Indica se a chave está em cache e dentro do prazo de validade, consultando apenas o índice.
+        
+        Args:
+            cache_key: Chave única para identificar os dados em cache
+            
+        Returns:
+            bool: True se os dados estão em cache e não expiraram
+        """
+        entry = self._index_entry(cache_key)
+        return entry is not None and not self._is_expired(entry)
+    
+    def cache_version(self, cache_key):
+        """
+        Retorna a versão (momento da gravação, ISO 8601) da chave se estiver válida, consultando apenas o índice.
+        
+        Args:
+            cache_key: Chave única para identificar os dados em cache
+            
+        Returns:
+            str com a versão ou None se os dados não estiverem em cache ou expirados
+        """
+        entry = self._index_entry(cache_key)
+        if entry is None or self._is_expired(entry):
+            return None
+        return entry["timestamp"]
+    
+    def list_cache(self, prefix=None):
+        """
+        Lista as entradas do cache a partir do índice, sem ler os dados.
+        
+        Args:
+            prefix: Prefixo das chaves a listar ou None para todas
+            
+        Returns:
+            DataFrame com chave, arquivo, formato, gravação, último acesso, linhas,
+            tamanho em bytes, versão do esquema, janela de origem e validade
+        """
+        entries = self.index.entries(prefix=prefix)
+        df = pd.DataFrame(entries, columns=list(INDEX_COLUMNS))
+        df["expired"] = [self._is_expired(entry) for entry in entries]
+        return df
+    
+    def _stats(self):
+        """Retorna o dicionário de estatísticas de limpeza deste diretório (chamar com _cleanup_lock)."""
+        return _cleanup_stats.setdefault(str(self.cache_dir.resolve()), {
+            "runs": 0,
+            "last_run": None,
+            "evicted_lru": 0,
+            "evicted_ttl": 0,
+            "evicted_bytes": 0,
+            "backups_removed": 0,
+        })
+    
+    def _evict(self, entry, reason):
+        """Remove uma entrada do cache (arquivos e índice) e contabiliza a remoção."""
+        for cache_path in self._cache_files(entry["key"]):
+            os.remove(cache_path)
+        self.index.remove(entry["key"])
+        
+        with _cleanup_lock:
+            stats = self._stats()
+            stats[f"evicted_{reason}"] += 1
+            stats["evicted_bytes"] += entry["bytes"] or 0
+        logger.info(f"Cache removido ({reason}): {entry['key']}")
+    
+    @staticmethod
+    def _last_access(entry):
+        """Momento do último acesso de uma entrada do índice."""
+        return datetime.fromisoformat(entry["accessed_at"] or entry["timestamp"])
+    
+    def _evict_lru(self, protect=None):
+        """
+        Remove as entradas acessadas há mais tempo até o cache caber em max_bytes e max_entries.
+        
+        Args:
+            protect: Chave que não deve ser removida (ex: a entrada recém-gravada)
+        """
+        entries = sorted(self.index.entries(), key=self._last_access)
+        total_bytes = sum(entry["bytes"] or 0 for entry in entries)
+        total_entries = len(entries)
+        
+        for entry in entries:
+            if total_bytes <= self.max_bytes and total_entries <= self.max_entries:
+                break
+            if entry["key"] == protect:
+                continue
+            self._evict(entry, "lru")
+            total_bytes -= entry["bytes"] or 0
+            total_entries -= 1
+    
+    def cleanup(self, force=False):
+        """
+        Remove entradas sem acesso há mais de retention_days, aplica os limites de
+        tamanho e de quantidade (LRU) e remove backups antigos.
+        
+        Consulta apenas o índice. Sem force, roda no máximo uma vez a cada
+        CACHE_CLEANUP_MINUTES minutos (padrão: 60) por diretório e processo.
+        
+        Args:
+            force: Se True, executa mesmo que a última limpeza seja recente
+            
+        Returns:
+            bool: True se a limpeza foi executada
+        """
+        with _cleanup_lock:
+            stats = self._stats()
+            if not force and stats["last_run"] is not None and time.time() - stats["last_run"] < self.cleanup_interval:
+                return False
+            stats["runs"] += 1
+            stats["last_run"] = time.time()
+        
+        try:
+            # Expiração por tempo sem acesso
+            limit = datetime.now() - timedelta(days=self.retention_days)
+            for entry in self.index.entries():
+                if self._last_access(entry) < limit:
+                    self._evict(entry, "ttl")
+            
+            # Limites de tamanho e quantidade
+            self._evict_lru()
+            
+            # Temporários de gravações interrompidas
+            for temp_path in self.cache_dir.glob(".*.tmp"):
+                if time.time() - temp_path.stat().st_mtime > TEMP_MAX_AGE_SECONDS:
+                    os.remove(temp_path)
+                    logger.info(f"Arquivo temporário abandonado removido: {temp_path.name}")
+            
+            # Backups: mesmo prazo e uma quantidade máxima de arquivos
+            if self.backup_dir.exists():
+                backups = sorted(self.backup_dir.glob("*.pkl"), key=lambda p: p.stat().st_mtime, reverse=True)
+                for position, path in enumerate(backups):
+                    if position >= self.max_backups or datetime.fromtimestamp(path.stat().st_mtime) < limit:
+                        os.remove(path)
+                        with _cleanup_lock:
+                            self._stats()["backups_removed"] += 1
+                        logger.info(f"Backup removido: {path.name}")
+            
+            return True
+            
+        except Exception as e:
+            logger.error(f"Erro na limpeza do cache: {str(e)}")
+            return False
+    
+    def cache_stats(self):
+        """
+        Retorna o uso do cache e as estatísticas de limpeza, a partir do índice.
+        
+        Returns:
+            Dicionário com entradas e bytes em uso, limites configurados e
+            contadores de remoções (LRU, tempo sem acesso e backups)
+        """
+        entries = self.index.entries()
+        with _cleanup_lock:
+            stats = dict(self._stats())
+        
+        if stats["last_run"] is not None:
+            stats["last_run"] = datetime.fromtimestamp(stats["last_run"]).isoformat(timespec="seconds")
+        
+        return {
+            "entries": len(entries),
+            "bytes": sum(entry["bytes"] or 0 for entry in entries),
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            **stats,
+        }
+    
+    def _is_expired(self, entry):
+        """Indica se a entrada do índice passou do prazo de validade."""
+        cached_time = datetime.fromisoformat(entry["timestamp"])
+        return datetime.now() > cached_time + timedelta(hours=self.cache_duration)
+    
+    def _index_entry(self, cache_key):
+        """
+        Retorna a entrada da chave no índice, conferindo se o arquivo ainda existe.
+        
+        Arquivos gravados fora do índice (ex: versões anteriores) são indexados
+        aqui; entradas cujo arquivo sumiu são removidas.
+        """
+        entry = self.index.get(cache_key)
+        if entry is not None:
+            if (self.cache_dir / entry["file"]).exists():
+                return entry
+            self.index.remove(cache_key)
+        
+        cache_path = self._cache_path(cache_key)
+        if cache_path is None:
+            return None
+        return self._index_file(cache_path)
+    
+    def _index_file(self, cache_path):
+        """
+        Registra no índice um arquivo de cache existente.
+        
+        Nos formatos colunares, o timestamp e os metadados vêm do rodapé do arquivo;
+        no pickle, o momento da gravação é a data de modificação do arquivo.
+        """
+        cache_format = next(fmt for fmt, ext in CACHE_EXTENSIONS.items() if ext == cache_path.suffix)
+        info = {"timestamp": None, "metadata": {}}
+        if cache_format != "pickle" and pa is not None:
+            try:
+                info = self._read_columnar_info(cache_path)
+            except Exception as e:
+                logger.warning(f"Rodapé ilegível em {cache_path.name}: {str(e)}")
+        
+        self.index.upsert(
+            cache_path.stem,
+            cache_path.name,
+            cache_format,
+            info["timestamp"] or datetime.fromtimestamp(cache_path.stat().st_mtime).isoformat(),
+            size_bytes=cache_path.stat().st_size,
+            metadata=info["metadata"]
+        )
+        return self.index.get(cache_path.stem)
+    
+    def _sync_index(self):
+        """Alinha o índice com os arquivos do diretório de cache."""
+        try:
+            on_disk = {
+                path.name: path for extension in CACHE_EXTENSIONS.values()
+                for path in self.cache_dir.glob(f"*{extension}")
+            }
+            indexed = {entry["file"]: entry["key"] for entry in self.index.entries()}
+            
+            for file, key in indexed.items():
+                if file not in on_disk:
+                    self.index.remove(key)
+            for file, path in on_disk.items():
+                if file not in indexed:
+                    self._index_file(path)
+                    
+        except Exception as e:
+            logger.error(f"Erro ao sincronizar o índice do cache: {str(e)}")
+    
+    @contextmanager
+    def lock(self, cache_key, timeout=None):
+        """
+        Trava exclusiva da chave, respeitada por todos os processos que usam o diretório de cache.
+        
+        É reentrante na mesma thread. Se a trava não for obtida no tempo de espera,
+        o bloco é executado sem ela; o contexto retorna se a trava foi obtida.
+        
+        Args:
+            cache_key: Chave do cache
+            timeout: Espera máxima em segundos (0 para não esperar) ou None para
+                CACHE_LOCK_TIMEOUT (padrão: 300), com um aviso no log se esgotada
+        """
+        lock_path = self.lock_dir / f"{cache_key}.lock"
+        held = getattr(_held_locks, "paths", None)
+        if held is None:
+            held = _held_locks.paths = set()
+        
+        if lock_path in held:
+            yield True
+            return
+        
+        file_lock = _FileLock(lock_path)
+        acquired = file_lock.acquire(self.lock_timeout if timeout is None else timeout)
+        if not acquired and timeout is None:
+            logger.warning(f"Trava de {cache_key} não obtida em {self.lock_timeout:.0f}s; seguindo sem ela")
+        
+        held.add(lock_path)
+        try:
+            yield acquired
+        finally:
+            held.discard(lock_path)
+            if acquired:
+                file_lock.release()
+    
+    @staticmethod
+    def _atomic_write(path, write):
+        """
+        Grava um arquivo de forma atômica: write(caminho) escreve em um temporário,
+        que é sincronizado com o disco e renomeado sobre path. Leitores nunca
+        veem um arquivo pela metade.
+        
+        Returns:
+            str com o checksum do arquivo gravado
+        """
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            write(temp_path)
+            with open(temp_path, "rb+") as f:
+                os.fsync(f.fileno())
+            checksum = _file_checksum(temp_path)
+            os.replace(temp_path, path)
+            return checksum
+        except BaseException:
+            if temp_path.exists():
+                os.remove(temp_path)
+            raise
+    
+    @staticmethod
+    def _write_pickle(cache_data, path):
+        """Grava uma entrada em pickle."""
+        with open(path, 'wb') as f:
+            pickle.dump(cache_data, f)
+    
+    def _verified_entry(self, entry, force=False):
+        """
+        Confere o checksum do arquivo da entrada com o registrado no índice.
+        
+        O checksum só é calculado se o tamanho ou a data de modificação do arquivo
+        diferirem dos registrados na gravação (ou com force=True, após uma falha
+        de leitura); do contrário, o arquivo é o mesmo gravado e não é relido.
+        Uma divergência é conferida de novo com a trava da chave (o arquivo pode
+        ter sido substituído por uma gravação concluída nesse meio tempo); se
+        persistir, o arquivo está corrompido e a entrada é removida.
+        
+        Args:
+            entry: Entrada do índice
+            force: Se True, calcula o checksum mesmo com o arquivo inalterado
+        
+        Returns:
+            A entrada (relida, se necessário) ou None se estiver corrompida
+        """
+        if not self.verify_checksum:
+            return entry
+        
+        def valid(candidate):
+            expected = candidate["metadata"].get("checksum")
+            if not expected:
+                return True
+            cache_path = self.cache_dir / candidate["file"]
+            if not force:
+                file_stat = cache_path.stat()
+                if (file_stat.st_size == candidate["bytes"]
+                        and file_stat.st_mtime_ns == candidate["metadata"].get("mtime_ns")):
+                    return True
+            return _file_checksum(cache_path) == expected
+        
+        if valid(entry):
+            return entry
+        
+        with self.lock(entry["key"]):
+            current = self._index_entry(entry["key"])
+            if current is None or valid(current):
+                return current
+            
+            logger.error(f"Checksum divergente em {current['file']}: entrada corrompida removida do cache")
+            for cache_path in self._cache_files(current["key"]):
+                os.remove(cache_path)
+            self.index.remove(current["key"])
+            return None
+    
+    def _read_verified(self, entry, columns=None):
+        """
+        Lê a entrada; se a leitura falhar, confere o checksum do arquivo e
+        descarta a entrada corrompida.
+        
+        Returns:
+            Dicionário com 'timestamp', 'metadata' e 'data' ou None se a entrada estiver corrompida
+        """
+        try:
+            return self._read_entry(self.cache_dir / entry["file"], columns)
+        except Exception as e:
+            if self.verify_checksum and entry["metadata"].get("checksum"):
+                logger.warning(f"Falha ao ler {entry['file']} ({str(e)}); conferindo o checksum")
+                current = self._verified_entry(entry, force=True)
+                if current is None:
+                    return None
+            raise
+    
+    def _cache_files(self, cache_key):
+        """Retorna os arquivos existentes da chave, em qualquer formato."""
+        candidates = (self.cache_dir / f"{cache_key}{extension}" for extension in CACHE_EXTENSIONS.values())
+        return [path for path in candidates if path.exists()]
+    
+    def _cache_path(self, cache_key):
+        """Retorna o arquivo mais recente da chave ou None se não houver nenhum."""
+        files = self._cache_files(cache_key)
+        if not files:
+            return None
+        return max(files, key=lambda path: path.stat().st_mtime)
+    
+    def _write_columnar(self, cache_data, cache_path, cache_format):
+        """
+        Grava uma entrada em Arrow IPC ou Parquet.
+        
+        O timestamp e os metadados da entrada ficam nos metadados do esquema, de
+        modo que podem ser lidos sem carregar as colunas, junto com as colunas
+        string[pyarrow], que a leitura mantém em Arrow (ver _table_to_pandas).
+        """
+        data = cache_data["data"]
+        arrow_strings = [
+            str(col) for col, dtype in data.dtypes.items()
+            if isinstance(dtype, pd.StringDtype) and dtype.storage == "pyarrow"
+        ]
+        table = pa.Table.from_pandas(data)
+        info = json.dumps(
+            {"timestamp": cache_data["timestamp"], "metadata": cache_data["metadata"], "arrow_strings": arrow_strings},
+            default=str
+        ).encode("utf-8")
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), ENTRY_METADATA_KEY: info})
+        
+        if cache_format == "arrow":
+            feather.write_feather(table, cache_path, compression=self.compression)
+        else:
+            compression = "none" if self.compression == "uncompressed" else self.compression
+            pq.write_table(table, cache_path, compression=compression)
+    
+    @staticmethod
+    def _read_columnar_info(cache_path):
+        """Lê apenas o timestamp e os metadados de uma entrada colunar (sem os dados)."""
+        if cache_path.suffix == CACHE_EXTENSIONS["arrow"]:
+            with pa.memory_map(str(cache_path)) as source:
+                schema = pa.ipc.open_file(source).schema
+        else:
+            schema = pq.read_schema(cache_path)
+        
+        info = json.loads((schema.metadata or {}).get(ENTRY_METADATA_KEY, b"{}"))
+        return {"timestamp": info.get("timestamp"), "metadata": info.get("metadata") or {}}
+    
+    def _read_entry(self, cache_path, columns=None):
+        """
+        Lê uma entrada completa do cache, em qualquer formato.
+        
+        Os formatos colunares são lidos mapeados em memória e apenas com as
+        colunas pedidas; no pickle, a seleção é feita após a leitura.
+        """
+        if cache_path.suffix == CACHE_EXTENSIONS["pickle"]:
+            with open(cache_path, 'rb') as f:
+                cache_data = pickle.load(f)
+            
+            # Entradas antigas não possuem metadados
+            cache_data.setdefault("metadata", {})
+            if columns is not None and isinstance(cache_data["data"], pd.DataFrame):
+                cache_data["data"] = cache_data["data"][[col for col in columns if col in cache_data["data"].columns]]
+            return cache_data
+        
+        if pa is None:
+            raise ImportError(f"pyarrow é necessário para ler {cache_path.name}")
+        
+        if cache_path.suffix == CACHE_EXTENSIONS["arrow"]:
+            if columns is not None:
+                with pa.memory_map(str(cache_path)) as source:
+                    available = set(pa.ipc.open_file(source).schema.names)
+                columns = [col for col in columns if col in available]
+            table = feather.read_table(cache_path, columns=columns, memory_map=True)
+        else:
+            if columns is not None:
+                available = set(pq.read_schema(cache_path).names)
+                columns = [col for col in columns if col in available]
+            table = pq.read_table(cache_path, columns=columns, memory_map=True)
+        
+        cache_data = self._read_columnar_info(cache_path)
+        cache_data["data"] = self._table_to_pandas(table)
+        return cache_data
+    
+    @staticmethod
+    def _table_to_pandas(table):
+        """
+        Converte uma tabela lida do cache em DataFrame, preservando as strings em Arrow.
+        
+        Sozinho, to_pandas devolve as colunas string[pyarrow] como string[python]
+        (objetos Python), perdendo a economia de memória do esquema e deixando a
+        mesma chave com tipos diferentes vindo do Bitrix24 ou do cache. Essas
+        colunas, registradas na gravação, são montadas direto dos buffers Arrow.
+        """
+        info = json.loads((table.schema.metadata or {}).get(ENTRY_METADATA_KEY, b"{}"))
+        arrow_strings = [col for col in info.get("arrow_strings") or [] if col in table.column_names]
+        others = [col for col in table.column_names if col not in arrow_strings]
+        if not arrow_strings or not others:
+            df = table.to_pandas()
+            for col in arrow_strings:
+                df[col] = df[col].astype(pd.StringDtype("pyarrow"))
+            return df
+        
+        df = table.select(others).to_pandas()
+        
+        # Inserir na posição original (em ordem crescente, sem copiar as demais colunas)
+        order = [col for col in table.column_names if col in df.columns or col in arrow_strings]
+        for col in arrow_strings:
+            try:
+                values = pd.arrays.ArrowStringArray(table.column(col))
+            except (TypeError, ValueError):
+                # Versões do pandas que não aceitam o tipo gravado (ex: large_string)
+                values = table.column(col).to_pandas().astype(pd.StringDtype("pyarrow")).array
+            df.insert(order.index(col), col, pd.Series(values, index=df.index))
+        
+        return df
+    
     def delete_cache(self, cache_key=None):
         """
         Remove dados específicos do cache ou limpa todo o cache.
@@ -118,16 +891,18 @@ class DataRepository:
         """
         try:
             if cache_key:
-                # Remover um cache específico
-                cache_path = self.cache_dir / f"{cache_key}.pkl"
-                if cache_path.exists():
+                # Remover um cache específico (em qualquer formato)
+                for cache_path in self._cache_files(cache_key):
                     os.remove(cache_path)
-                    logger.info(f"Cache removido: {cache_key}")
+                    logger.info(f"Cache removido: {cache_path.name}")
+                self.index.remove(cache_key)
                 return True
             else:
                 # Limpar todo o diretório de cache
-                for cache_file in self.cache_dir.glob("*.pkl"):
-                    os.remove(cache_file)
+                for extension in CACHE_EXTENSIONS.values():
+                    for cache_file in self.cache_dir.glob(f"*{extension}"):
+                        os.remove(cache_file)
+                self.index.clear()
                 logger.info("Cache limpo completamente")
                 return True
                 
@@ -215,7 +990,7 @@ class DataRepository:
         
         try:
             # Criar pasta de backups se não existir
-            backup_dir = Path("./backups")
+            backup_dir = self.backup_dir
             if not backup_dir.exists():
                 backup_dir.mkdir(parents=True, exist_ok=True)
             
@@ -224,9 +999,8 @@ class DataRepository:
             description = description.replace(" ", "_") if description else "backup"
             backup_path = backup_dir / f"{description}_{timestamp}.pkl"
             
-            # Salvar utilizando pickle
-            with open(backup_path, 'wb') as f:
-                pickle.dump(data, f)
+            # Salvar utilizando pickle (em um temporário renomeado ao final)
+            self._atomic_write(backup_path, lambda path: self._write_pickle(data, path))
             
             logger.info(f"Backup criado: {backup_path}")
             return str(backup_path)
@@ -0,0 +1,203 @@
+import os
+import time
+import logging
+import threading
+
+from .single_flight import shared_flight
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("DatasetStore")
+
+
+class _Dataset:
+    """Um conjunto de dados carregado em memória e as sessões que o utilizam."""
+
+    def __init__(self, data):
+        self.data = data
+        self.refs = 0
+        self.last_used = time.monotonic()
+
+
+class DatasetStore:
+    """
+    Camada em memória, compartilhada por todo o processo, na frente do cache em disco.
+
+    Cada conjunto é identificado por uma chave e uma versão (o momento da
+    gravação no cache) e fica uma única vez em memória, qualquer que seja o
+    número de sessões abertas. As sessões recebem visões rasas (sem cópia dos
+    dados) e devem tratá-las como somente leitura: acrescentar ou substituir
+    colunas na visão não altera o conjunto compartilhado, mas alterar valores
+    de colunas existentes no lugar alteraria.
+
+    Colunas derivadas são acrescentadas ao conjunto compartilhado com extend,
+    uma única vez por versão, e passam a fazer parte das visões seguintes.
+    
+    Cada visão entregue por acquire conta uma referência, devolvida com
+    release. Versões antigas são liberadas quando a última sessão as devolve;
+    a versão mais recente de cada chave continua em memória sem referências,
+    até o limite de DATASET_STORE_MAX_IDLE conjuntos (padrão: 8), removidos
+    do menos usado para o mais usado.
+    """
+
+    def __init__(self, max_idle=None):
+        if max_idle is None:
+            try:
+                max_idle = int(os.environ.get("DATASET_STORE_MAX_IDLE", 8))
+            except (ValueError, TypeError):
+                max_idle = 8
+        self.max_idle = max_idle
+
+        self._lock = threading.Lock()
+        self._datasets = {}
+        self._latest = {}
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, key, version, loader):
+        """
+        Retorna uma visão do conjunto (key, version) e registra uma referência.
+
+        Na primeira vez, o conjunto é obtido com loader(); sessões que pedem a
+        mesma versão ao mesmo tempo aguardam um único carregamento.
+
+        Args:
+            key: Chave (hashable) do conjunto
+            version: Versão do conjunto (comparável; versões maiores são mais recentes)
+            loader: Função sem argumentos que retorna o DataFrame ou None
+
+        Returns:
+            Visão rasa do DataFrame ou None se loader não retornar dados
+        """
+        with self._lock:
+            dataset = self._datasets.get((key, version))
+            if dataset is not None:
+                self.hits += 1
+                return self._lease(key, version, dataset)
+
+        data, _ = shared_flight.do(("dataset_store", key, version), loader)
+        if data is None:
+            return None
+
+        with self._lock:
+            dataset = self._datasets.get((key, version))
+            if dataset is None:
+                self.misses += 1
+                dataset = _Dataset(data)
+                self._datasets[(key, version)] = dataset
+                logger.info(f"Conjunto {key} (versão {version}) carregado em memória: {len(data)} registros")
+            else:
+                self.hits += 1
+            return self._lease(key, version, dataset)
+
+    def extend(self, key, version, columns, builder):
+        """
+        Acrescenta colunas derivadas ao conjunto (key, version), calculadas uma única vez.
+        
+        builder recebe uma visão rasa do conjunto e retorna o DataFrame com as
+        colunas calculadas; as colunas novas passam ao conjunto compartilhado
+        (substituído por uma nova visão, sem alterar o anterior), de modo que
+        todas as sessões as recebem sem recalcular. Sessões que pedem as mesmas
+        colunas ao mesmo tempo aguardam um único cálculo.
+        
+        Args:
+            key: Chave do conjunto
+            version: Versão do conjunto
+            columns: Colunas desejadas
+            builder: Função que recebe um DataFrame e retorna o DataFrame com as colunas
+            
+        Returns:
+            Visão rasa do conjunto com as colunas ou None se (key, version) não estiver em memória
+        """
+        with self._lock:
+            dataset = self._datasets.get((key, version))
+            if dataset is None:
+                return None
+            missing = tuple(sorted(col for col in columns if col not in dataset.data.columns))
+        
+        if missing:
+            built, _ = shared_flight.do(
+                ("dataset_store_extend", key, version, missing),
+                lambda: builder(dataset.data.copy(deep=False))
+            )
+            with self._lock:
+                new_columns = [col for col in built.columns if col not in dataset.data.columns]
+                if new_columns:
+                    extended = dataset.data.copy(deep=False)
+                    for col in new_columns:
+                        extended[col] = built[col]
+                    dataset.data = extended
+                    logger.info(f"Colunas {new_columns} acrescentadas ao conjunto {key} (versão {version})")
+        
+        with self._lock:
+            dataset.last_used = time.monotonic()
+            return dataset.data.copy(deep=False)
+    
+    def release(self, key, version):
+        """
+        Devolve uma referência ao conjunto (key, version).
+
+        Args:
+            key: Chave do conjunto
+            version: Versão recebida em acquire
+        """
+        with self._lock:
+            dataset = self._datasets.get((key, version))
+            if dataset is None:
+                return
+            dataset.refs = max(dataset.refs - 1, 0)
+            dataset.last_used = time.monotonic()
+            self._collect()
+
+    def _lease(self, key, version, dataset):
+        """Registra uma referência e retorna a visão (com o lock adquirido)."""
+        dataset.refs += 1
+        dataset.last_used = time.monotonic()
+        if version > self._latest.get(key, version):
+            logger.info(f"Nova versão do conjunto {key}: {version}")
+        self._latest[key] = max(version, self._latest.get(key, version))
+        self._collect()
+        return dataset.data.copy(deep=False)
+
+    def _collect(self):
+        """Libera versões antigas sem referências e conjuntos ociosos além do limite (com o lock adquirido)."""
+        for (key, version), dataset in list(self._datasets.items()):
+            if dataset.refs == 0 and version != self._latest.get(key):
+                del self._datasets[(key, version)]
+                logger.info(f"Versão {version} do conjunto {key} liberada da memória")
+
+        idle = sorted(
+            (dataset.last_used, dataset_key)
+            for dataset_key, dataset in self._datasets.items()
+            if dataset.refs == 0
+        )
+        for _, (key, version) in idle[:max(len(idle) - self.max_idle, 0)]:
+            del self._datasets[(key, version)]
+            if self._latest.get(key) == version:
+                del self._latest[key]
+            logger.info(f"Conjunto ocioso {key} (versão {version}) liberado da memória")
+
+    def clear(self):
+        """Remove da memória os conjuntos sem referências."""
+        with self._lock:
+            for dataset_key, dataset in list(self._datasets.items()):
+                if dataset.refs == 0:
+                    del self._datasets[dataset_key]
+
+    def stats(self):
+        """Retorna os conjuntos em memória, as referências e os acertos."""
+        with self._lock:
+            return {
+                "datasets": len(self._datasets),
+                "referencias": sum(dataset.refs for dataset in self._datasets.values()),
+                "registros": sum(len(dataset.data) for dataset in self._datasets.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Instância compartilhada por todo o processo (todas as sessões do Streamlit)
+shared_datasets = DatasetStore()
@@ -0,0 +1,191 @@
+"""
+Ingestão dos dados do Bitrix24 sem o Streamlit
+
+Executa o pipeline completo (BitrixConnector -> DataProcessor -> DataRepository)
+e grava no cache o mesmo snapshot colunar que o dashboard lê, de modo que a
+busca pesada pode rodar fora do servidor web (cron, worker, etc.).
+
+Para executar:
+python -m src.data.ingest [--start 2024-01-01] [--end 2024-03-31] [--days 90]
+                          [--category 34 --category 36] [--cache-dir ./cache]
+                          [--raw] [--incremental] [--skip-fresh] [--log-json]
+
+Códigos de saída: 0 em caso de sucesso, 1 se alguma categoria falhar e 2 para
+argumentos inválidos.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+from .bitrix_integration import BitrixIntegration
+
+# Carregar variáveis de ambiente do arquivo .env, se o python-dotenv estiver disponível
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+logger = logging.getLogger("BitrixIngest")
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Formata cada registro de log como uma linha JSON, com os campos passados em extra={'fields': {...}}."""
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(json_logs):
+    """Direciona todos os logs para a saída de erro, em JSON ou texto."""
+    handler = logging.StreamHandler(sys.stderr)
+    if json_logs:
+        handler.setFormatter(JsonLogFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+
+
+def _date(value):
+    """Valida uma data no formato 'YYYY-MM-DD' (argparse)."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {value!r} (use YYYY-MM-DD)")
+
+
+def parse_args(argv=None):
+    """Lê os argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(description="Ingestão dos dados do Bitrix24 para o cache do dashboard")
+    parser.add_argument("--start", type=_date, help="Data inicial (YYYY-MM-DD); padrão: hoje menos --days")
+    parser.add_argument("--end", type=_date, help="Data final (YYYY-MM-DD); padrão: hoje")
+    parser.add_argument("--days", type=int, default=90, help="Dias da janela quando --start não é informado (padrão: 90)")
+    parser.add_argument("--category", type=int, action="append",
+                        help="ID da categoria; pode ser repetido (padrão: BITRIX_CATEGORY_ID ou 34)")
+    parser.add_argument("--cache-dir", default="./cache", help="Diretório de cache lido pelo dashboard")
+    parser.add_argument("--raw", action="store_true", help="Grava os dados sem processamento")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Busca apenas os negócios modificados desde a última sincronização")
+    parser.add_argument("--skip-fresh", action="store_true", help="Não busca categorias com cache ainda válido")
+    parser.add_argument("--log-json", action="store_true", help="Logs estruturados, uma linha JSON por registro")
+    args = parser.parse_args(argv)
+
+    args.end = args.end or datetime.now().strftime("%Y-%m-%d")
+    args.start = args.start or (
+        datetime.strptime(args.end, "%Y-%m-%d") - timedelta(days=args.days)
+    ).strftime("%Y-%m-%d")
+    if args.start > args.end:
+        parser.error(f"--start ({args.start}) posterior a --end ({args.end})")
+
+    if not args.category:
+        try:
+            args.category = [int(os.environ.get("BITRIX_CATEGORY_ID", 34))]
+        except (ValueError, TypeError):
+            args.category = [34]
+
+    return args
+
+
+def ingest_category(integration, args, category_id):
+    """
+    Executa o pipeline para uma categoria e grava o resultado no cache.
+
+    Returns:
+        True em caso de sucesso, False se o Bitrix24 não respondeu
+    """
+    fields = {"category_id": category_id, "start_date": args.start, "end_date": args.end}
+    cache_key = integration.data_cache_key(args.start, args.end, category_id, process_data=not args.raw)
+
+    if args.skip_fresh and integration.repository.is_fresh(cache_key):
+        logger.info("Cache ainda válido; categoria ignorada", extra={"fields": {**fields, "status": "fresh"}})
+        return True
+
+    logger.info("Ingestão iniciada", extra={"fields": fields})
+    started = time.perf_counter()
+    # Sempre ignorar o cache da janela: no modo incremental, é a sincronização (que usa o
+    # conjunto armazenado e a marca d'água) que evita baixar de novo o que não mudou
+    df = integration.get_data(
+        start_date=args.start,
+        end_date=args.end,
+        category_id=category_id,
+        use_cache=True,
+        force_refresh=True,
+        process_data=not args.raw,
+        incremental=args.incremental
+    )
+    seconds = round(time.perf_counter() - started, 3)
+
+    # Sem resposta do Bitrix24, get_data devolve o último snapshot em vez de dados novos
+    source = (integration.last_load_info or {}).get("source")
+    if source != "bitrix":
+        logger.error(
+            "Bitrix24 indisponível; nenhum dado novo gravado",
+            extra={"fields": {**fields, "status": "failed", "source": source, "seconds": seconds}}
+        )
+        return False
+
+    logger.info(
+        "Ingestão concluída",
+        extra={"fields": {
+            **fields,
+            "status": "ok",
+            "source": source,
+            "rows": len(df),
+            "seconds": seconds,
+            "cache_key": cache_key,
+            "cached": integration.repository.is_fresh(cache_key),
+            "stages": integration.last_process_stats,
+        }}
+    )
+    if df.empty:
+        logger.warning("Nenhum negócio no período", extra={"fields": fields})
+    return True
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(args.log_json)
+
+    try:
+        # Sem atualização em segundo plano: o processo termina ao final da ingestão
+        integration = BitrixIntegration(cache_dir=args.cache_dir, stale_while_revalidate=False)
+    except Exception:
+        logger.exception("Não foi possível inicializar a integração com o Bitrix24")
+        return 1
+
+    failed = []
+    try:
+        for category_id in args.category:
+            try:
+                if not ingest_category(integration, args, category_id):
+                    failed.append(category_id)
+            except Exception:
+                logger.exception("Erro na ingestão", extra={"fields": {"category_id": category_id}})
+                failed.append(category_id)
+    finally:
+        integration.close()
+
+    if failed:
+        logger.error("Ingestão com falhas", extra={"fields": {"failed_categories": failed}})
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
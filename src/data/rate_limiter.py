@@ -0,0 +1,241 @@
+import os
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("RateLimiter")
+
+# Códigos HTTP com que o portal sinaliza excesso de requisições
+THROTTLE_STATUS_CODES = (429, 503)
+
+# Códigos HTTP transitórios que justificam uma nova tentativa
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def _env_float(name, default):
+    """Lê um número da variável de ambiente, usando o valor padrão se ausente ou inválido."""
+    try:
+        return float(os.environ.get(name, default))
+    except (ValueError, TypeError):
+        return float(default)
+
+
+def parse_retry_after(value):
+    """
+    Interpreta o cabeçalho Retry-After.
+
+    Args:
+        value: Valor do cabeçalho (segundos ou data HTTP) ou None
+
+    Returns:
+        Segundos a aguardar ou None se o cabeçalho estiver ausente ou inválido
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (ValueError, TypeError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (ValueError, TypeError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """
+    Limitador de requisições ao Bitrix24 compartilhado por todo o processo.
+
+    Combina um token bucket (taxa de requisições por segundo com rajada) com um
+    limite de requisições simultâneas ajustado por AIMD: cada sucesso aumenta o
+    limite e a taxa aditivamente até o máximo configurado, e cada resposta de
+    throttling (429/503) os reduz pela metade. Um Retry-After bloqueia novas
+    requisições até o prazo indicado.
+
+    Configuração pelas variáveis de ambiente:
+        BITRIX_RATE_LIMIT: requisições por segundo (padrão: 2)
+        BITRIX_RATE_BURST: tamanho máximo da rajada (padrão: 5)
+        BITRIX_MAX_CONCURRENCY: requisições simultâneas (padrão: 4)
+        BITRIX_MAX_RETRIES: novas tentativas por requisição (padrão: 3)
+        BITRIX_BACKOFF_BASE: espera base do backoff em segundos (padrão: 1)
+        BITRIX_BACKOFF_MAX: espera máxima do backoff em segundos (padrão: 30)
+    """
+
+    def __init__(self, rate=None, burst=None, max_concurrency=None, max_retries=None,
+                 backoff_base=None, backoff_max=None, min_rate=0.1):
+        self.max_rate = rate if rate is not None else _env_float("BITRIX_RATE_LIMIT", 2)
+        self.burst = burst if burst is not None else _env_float("BITRIX_RATE_BURST", 5)
+        self.max_concurrency = int(max_concurrency if max_concurrency is not None
+                                   else _env_float("BITRIX_MAX_CONCURRENCY", 4))
+        self.max_retries = int(max_retries if max_retries is not None
+                               else _env_float("BITRIX_MAX_RETRIES", 3))
+        self.backoff_base = backoff_base if backoff_base is not None else _env_float("BITRIX_BACKOFF_BASE", 1)
+        self.backoff_max = backoff_max if backoff_max is not None else _env_float("BITRIX_BACKOFF_MAX", 30)
+        self.min_rate = min(min_rate, self.max_rate)
+
+        # Estado ajustado dinamicamente
+        self.rate = self.max_rate
+        self.concurrency_limit = float(self.max_concurrency)
+        self.tokens = self.burst
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+        # Estatísticas
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+
+    def _refill(self, now):
+        """Repõe os tokens proporcionalmente ao tempo decorrido (chamar com o lock adquirido)."""
+        elapsed = now - self._updated
+        self._updated = now
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+
+    def acquire(self):
+        """Bloqueia até haver um token e uma vaga de concorrência disponíveis."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.in_flight >= max(1, int(self.concurrency_limit)):
+                    wait = None  # Aguardar a liberação de uma vaga
+                elif self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    self.requests += 1
+                    return
+
+                self._cond.wait(timeout=wait)
+
+    def release(self):
+        """Libera a vaga de concorrência ocupada por acquire."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Contexto que ocupa uma vaga do limitador durante uma requisição."""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self):
+        """Aumento aditivo do limite de concorrência e da taxa após uma resposta normal."""
+        with self._cond:
+            self.concurrency_limit = min(
+                float(self.max_concurrency),
+                self.concurrency_limit + 1.0 / max(1.0, self.concurrency_limit)
+            )
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+            self._cond.notify_all()
+
+    def _cap_retry_after(self, retry_after):
+        """
+        Limita a espera pedida pelo Retry-After a backoff_max segundos.
+
+        Um cabeçalho com prazo longo (ou uma data HTTP distante) não pode prender
+        as requisições, nem a sessão que aguarda, por tempo indeterminado.
+        """
+        if retry_after is not None and retry_after > self.backoff_max:
+            logger.warning(
+                f"Retry-After de {retry_after:.1f}s acima do limite; aguardando {self.backoff_max:.1f}s "
+                f"(BITRIX_BACKOFF_MAX)"
+            )
+            return self.backoff_max
+        return retry_after
+
+    def on_throttle(self, retry_after=None):
+        """
+        Redução multiplicativa do limite de concorrência e da taxa após throttling.
+
+        Args:
+            retry_after: Segundos indicados pelo cabeçalho Retry-After, se houver
+                (limitados a backoff_max)
+        """
+        retry_after = self._cap_retry_after(retry_after)
+        with self._cond:
+            self.throttled += 1
+            self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            logger.warning(
+                f"Throttling do Bitrix24: taxa reduzida para {self.rate:.2f} req/s e "
+                f"concorrência para {int(self.concurrency_limit)}"
+                + (f"; aguardando {retry_after:.1f}s (Retry-After)" if retry_after else "")
+            )
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """
+        Calcula a espera antes de uma nova tentativa e a contabiliza.
+
+        Usa o Retry-After quando informado, limitado a backoff_max; caso
+        contrário, backoff exponencial com jitter completo.
+
+        Args:
+            attempt: Número da tentativa que falhou (começando em 0)
+            retry_after: Segundos indicados pelo cabeçalho Retry-After, se houver
+
+        Returns:
+            Segundos a aguardar
+        """
+        with self._cond:
+            self.retries += 1
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def stats(self):
+        """
+        Retorna o estado atual do limitador.
+
+        Returns:
+            Dicionário com taxa atual, limite de concorrência, requisições em
+            andamento e contadores de requisições, throttling e novas tentativas
+        """
+        with self._cond:
+            return {
+                "rate": round(self.rate, 3),
+                "max_rate": self.max_rate,
+                "concurrency_limit": int(self.concurrency_limit),
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "retries": self.retries,
+            }
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Retorna o limitador compartilhado por todo o processo, criando-o na primeira chamada."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = AdaptiveRateLimiter()
+        return _rate_limiter
@@ -0,0 +1,171 @@
+import os
+import logging
+import pandas as pd
+
+# Strings em Arrow, se o pyarrow estiver instalado
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    STRING_DTYPE = pd.StringDtype()
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("DealSchema")
+
+# Versão do esquema; faz parte das chaves de cache para não misturar formatos antigos
+SCHEMA_VERSION = 1
+
+# Fuso horário em que o portal registra as datas
+TIMEZONE = os.environ.get("BITRIX_TIMEZONE", "America/Sao_Paulo")
+
+# Formatos aceitos para as colunas de data, na ordem em que são tentados
+DATE_FORMATS = (
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y",
+)
+
+# Categorias da coluna derivada categoria_fase (DataProcessor.create_stage_categories)
+CATEGORIAS_FASE = ['Assinatura', 'Negociação', 'Reunião', 'Outros']
+
+# Esquema do DataFrame de negócios: coluna -> tipo
+#   ID                                 Int64 (inteiro anulável)
+#   Responsável, Fase                  category (poucos valores distintos)
+#   TÍTULO, LINK ARVORE DA FAMÍLIA     string (Arrow quando disponível)
+#   Criado, Modificado, FECHADO        datetime64[ns, TIMEZONE]
+# As demais colunas (ex: REUNIÃO) são mantidas como estão.
+DEAL_SCHEMA = {
+    "ID": "Int64",
+    "Responsável": "category",
+    "Fase": "category",
+    "TÍTULO": STRING_DTYPE,
+    "LINK ARVORE DA FAMÍLIA PLATAFORMA": STRING_DTYPE,
+    "Criado": "datetime",
+    "Modificado": "datetime",
+    "FECHADO": "datetime",
+}
+
+
+def parse_datetime(series, tz=None):
+    """
+    Converte uma coluna de datas para datetime64 com fuso horário.
+
+    Cada formato de DATE_FORMATS é aplicado apenas aos valores ainda não
+    convertidos, sem inferência de formato. Datas sem fuso são localizadas em
+    tz; datas com fuso são convertidas para tz.
+
+    Args:
+        series: Coluna com as datas (texto ou datetime)
+        tz: Fuso horário de destino ou None para TIMEZONE
+
+    Returns:
+        Series datetime64[ns, tz]; valores vazios ou inválidos viram NaT
+    """
+    tz = tz or TIMEZONE
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if series.dt.tz is None:
+            return series.dt.tz_localize(tz, ambiguous='NaT', nonexistent='shift_forward')
+        return series.dt.tz_convert(tz)
+
+    result = pd.Series(pd.NaT, index=series.index, dtype=f"datetime64[ns, {tz}]")
+    texto = series.where(series.notna(), None).astype(object)
+    try:
+        # Vetorizado: no acessor .str, valores que não são texto viram NaN
+        texto = texto.where(texto.str.strip().fillna("").ne(""))
+    except AttributeError:
+        # Coluna sem nenhum texto (ex: apenas números): nada a converter
+        texto = pd.Series(None, index=series.index, dtype=object)
+    pendentes = texto.notna()
+
+    for formato in DATE_FORMATS:
+        if not pendentes.any():
+            break
+        # Offsets diferentes entre as linhas só são combináveis em UTC
+        convertidos = pd.to_datetime(texto[pendentes], format=formato, errors='coerce', utc="%z" in formato)
+        if convertidos.dt.tz is None:
+            convertidos = convertidos.dt.tz_localize(tz, ambiguous='NaT', nonexistent='shift_forward')
+        else:
+            convertidos = convertidos.dt.tz_convert(tz)
+        ok = convertidos.notna()
+        result.loc[ok[ok].index] = convertidos[ok]
+        pendentes.loc[ok[ok].index] = False
+
+    if pendentes.any():
+        logger.warning(f"{int(pendentes.sum())} datas em formato não reconhecido foram descartadas")
+
+    return result
+
+
+def require_datetime(df, columns):
+    """
+    Verifica se as colunas de data já foram convertidas na entrada dos dados.
+
+    As datas são convertidas uma única vez, por enforce_schema; funções
+    posteriores usam esta verificação em vez de converter a coluna novamente.
+
+    Args:
+        df: DataFrame a verificar
+        columns: Colunas que devem estar em datetime64
+
+    Raises:
+        TypeError: Se alguma coluna não estiver em datetime64
+    """
+    invalid = [col for col in columns if not pd.api.types.is_datetime64_any_dtype(df[col])]
+    if invalid:
+        raise TypeError(
+            f"Colunas {invalid} não estão em datetime64; aplique enforce_schema na entrada dos dados"
+        )
+
+
+def now(tz=None):
+    """Retorna o instante atual no fuso horário do esquema."""
+    return pd.Timestamp.now(tz=tz or TIMEZONE)
+
+
+def enforce_schema(df):
+    """
+    Aplica o esquema DEAL_SCHEMA ao DataFrame de negócios, no lugar.
+
+    Deve ser chamado uma única vez, na entrada dos dados (Bitrix24 ou CSV).
+    Colunas já no tipo do esquema não são convertidas novamente.
+
+    Args:
+        df: DataFrame com os dados extraídos (alterado no lugar)
+
+    Returns:
+        O próprio df, com os tipos do esquema
+    """
+    if df is None or df.empty:
+        return df
+
+    for col, dtype in DEAL_SCHEMA.items():
+        if col not in df.columns:
+            continue
+
+        try:
+            if dtype == "datetime":
+                if not isinstance(df[col].dtype, pd.DatetimeTZDtype):
+                    df[col] = parse_datetime(df[col])
+            elif dtype == "Int64":
+                if df[col].dtype != "Int64":
+                    df[col] = pd.to_numeric(df[col], errors='coerce').astype("Int64")
+            elif dtype == "category":
+                if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                    df[col] = df[col].astype("category")
+            elif df[col].dtype != dtype:
+                df[col] = df[col].astype(dtype)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Não foi possível aplicar o tipo {dtype} à coluna {col}: {str(e)}")
+
+    return df
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import logging
+import threading
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("SingleFlight")
+
+
+class _Call:
+    """Uma execução em andamento e o resultado compartilhado com quem a aguarda."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplicação de chamadas concorrentes idênticas.
+
+    Enquanto uma chamada com determinada chave está em andamento, outras
+    chamadas com a mesma chave aguardam e recebem o mesmo resultado (ou a
+    mesma exceção), em vez de repetir o trabalho.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Executa fn(*args, **kwargs) uma única vez para todas as chamadas simultâneas com a mesma chave.
+
+        Args:
+            key: Chave (hashable) que identifica a chamada
+            fn: Função a ser executada
+            *args, **kwargs: Argumentos repassados para fn
+
+        Returns:
+            Tupla (resultado, compartilhado), onde compartilhado é True quando o
+            resultado veio da execução iniciada por outra chamada
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not leader:
+            logger.info(f"Aguardando execução em andamento para {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.info(f"Resultado de {key} compartilhado com {call.waiters} chamadas concorrentes")
+            call.done.set()
+
+        return call.result, False
+
+    def in_flight(self):
+        """Retorna as chaves das execuções em andamento."""
+        with self._lock:
+            return list(self._calls.keys())
+
+
+def request_key(table, payload, *extra):
+    """
+    Gera uma chave normalizada para uma consulta: (tabela, hash do payload, extras).
+
+    Args:
+        table: Nome da tabela consultada
+        payload: Parâmetros da consulta (serializados com chaves ordenadas)
+        *extra: Valores adicionais que diferenciam a consulta (ex: URL base)
+
+    Returns:
+        Tupla utilizável como chave em SingleFlight.do
+    """
+    normalized = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+    return (table, digest) + tuple(extra)
+
+
+# Instância compartilhada por todo o processo (todas as sessões do Streamlit)
+shared_flight = SingleFlight()
@@ -4,6 +4,8 @@ import streamlit as st
 import requests
 import time
 from typing import Optional, Dict, Any, Tuple, List, Union
+from ..data.bi_decoder import loads, matrix_to_dataframe
+from ..data.rate_limiter import get_rate_limiter, parse_retry_after, THROTTLE_STATUS_CODES
 
 class BitrixService:
     """Classe para gerenciar dados do Bitrix24"""
@@ -26,33 +28,43 @@ class BitrixService:
         Returns:
             Dados da consulta ou None em caso de erro
         """
+        limiter = get_rate_limiter()
+        
         for attempt in range(max_retries):
+            retry_after = None
             try:
                 url = f"{self.BITRIX_BASE_URL}?token={self.BITRIX_TOKEN}&table={table}"
                 
-                if filtros:
-                    response = requests.post(url, json=filtros, timeout=timeout)
-                else:
-                    response = requests.get(url, timeout=timeout)
+                with limiter.slot():
+                    if filtros:
+                        response = requests.post(url, json=filtros, timeout=timeout)
+                    else:
+                        response = requests.get(url, timeout=timeout)
+                
+                if response.status_code in THROTTLE_STATUS_CODES:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    limiter.on_throttle(retry_after)
+                elif response.status_code < 500:
+                    limiter.on_success()
                 
                 response.raise_for_status()
                 
                 if response.status_code == 200:
-                    return response.json()
+                    return loads(response.content)
                 
             except requests.exceptions.Timeout:
                 if attempt == max_retries - 1:
                     st.error(f"Timeout ao consultar {table} (tentativa {attempt + 1}/{max_retries})")
                     return None
                 st.warning(f"Timeout, tentando novamente... ({attempt + 1}/{max_retries})")
-                time.sleep(1)
+                time.sleep(limiter.backoff_delay(attempt))
                 
-            except requests.exceptions.RequestException as e:
+            except (requests.exceptions.RequestException, ValueError) as e:
                 if attempt == max_retries - 1:
                     st.error(f"Erro ao consultar {table}: {str(e)}")
                     return None
                 st.warning(f"Erro, tentando novamente... ({attempt + 1}/{max_retries})")
-                time.sleep(1)
+                time.sleep(limiter.backoff_delay(attempt, retry_after))
         
         return None
     
@@ -88,7 +100,7 @@ class BitrixService:
                 return None
             
             # Converter para DataFrame
-            deals_df = pd.DataFrame(deals_data[1:], columns=deals_data[0])
+            deals_df, _ = matrix_to_dataframe(deals_data)
             
             if deals_df.empty:
                 st.warning("Nenhum negócio encontrado na categoria 32")
@@ -115,7 +127,7 @@ class BitrixService:
                 st.error("Não foi possível obter os dados complementares")
                 return None
                 
-            deals_uf_df = pd.DataFrame(deals_uf_data[1:], columns=deals_uf_data[0])
+            deals_uf_df, _ = matrix_to_dataframe(deals_uf_data)
             
             # 3. Mesclar os dataframes
             df_completo = pd.merge(
@@ -306,10 +306,10 @@ class FamiliaService:
                 print(f"Dados obtidos: {len(df)} registros")
                 print("Tipos de dados iniciais:", df.dtypes)
                 
-                # Converter a coluna 'data' para datetime se for string
+                # Converter a coluna 'data' (DATE do MySQL) para datetime, com formato explícito
                 if df['data'].dtype == 'object':
                     print("Convertendo coluna 'data' para datetime")
-                    df['data'] = pd.to_datetime(df['data'])
+                    df['data'] = pd.to_datetime(df['data'].astype(str), format='%Y-%m-%d', errors='coerce')
                     print("Tipo após conversão:", df['data'].dtype)
                 
                 # Verificar valores não finitos em 'hora'
@@ -397,7 +397,8 @@ class FamiliaService:
                 })
                 
                 # Formatar datas com tratamento de valores nulos
-                df['createdAt'] = pd.to_datetime(df['createdAt'], errors='coerce')
+                if not pd.api.types.is_datetime64_any_dtype(df['createdAt']):
+                    df['createdAt'] = pd.to_datetime(df['createdAt'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
                 df['createdAt'] = df['createdAt'].fillna(pd.Timestamp.min)
                 df['createdAt'] = df['createdAt'].dt.strftime('%d/%m/%Y %H:%M')
                 df['createdAt'] = df['createdAt'].replace('01/01/1677 00:00', 'N/A')
@@ -27,6 +27,9 @@ logger = logging.getLogger("ResponsavelDashboard")
 
 # Importar módulos necessários
 from src.data.bitrix_integration import BitrixIntegration
+from src.data.data_processor import DataProcessor
+from src.data.schema import enforce_schema, require_datetime
+from src.data.dataset_store import shared_datasets
 
 # Função para formatar números com separador de milhar
 def formatar_numero(valor):
@@ -38,6 +41,16 @@ def formatar_numero(valor):
     except:
         return str(valor)
 
+# Função para descrever há quanto tempo um dado foi salvo
+def formatar_idade(momento):
+    """Descreve o tempo decorrido desde o momento informado (ex: '3 horas')."""
+    segundos = max(0, (datetime.now() - momento).total_seconds())
+    if segundos < 3600:
+        return f"{int(segundos // 60)} minutos"
+    if segundos < 48 * 3600:
+        return f"{int(segundos // 3600)} horas"
+    return f"{int(segundos // 86400)} dias"
+
 # Função para gerar link de download para arquivo Excel
 def get_excel_download_link(df, filename="dados.xlsx", text="Baixar Excel"):
     """
@@ -51,6 +64,12 @@ def get_excel_download_link(df, filename="dados.xlsx", text="Baixar Excel"):
     Returns:
         String HTML com o link para download
     """
+    # O Excel não aceita datas com fuso horário
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.DatetimeTZDtype):
+            df[col] = df[col].dt.tz_localize(None)
+    
     # Criar buffer em memória
     output = io.BytesIO()
     
@@ -80,6 +99,12 @@ BITRIX_AVAILABLE = True  # Assumimos que a integração está disponível por pa
 # Verificar modo de diagnóstico
 DIAGNOSTICO = os.environ.get("DIAGNOSTICO", "False").lower() == "true"
 
+# Intervalo (segundos) da verificação do fim da atualização em segundo plano
+try:
+    REVALIDATION_POLL_SECONDS = float(os.environ.get("BITRIX_REVALIDATION_POLL_SECONDS", 3))
+except (ValueError, TypeError):
+    REVALIDATION_POLL_SECONDS = 3.0
+
 # Carregar configurações do Streamlit, se disponíveis
 try:
     if "bitrix" in st.secrets:
@@ -595,6 +620,15 @@ class ResponsavelDashboard:
                         st.json(env_vars)
                     raise e
             
+            # Atualização em segundo plano iniciada em uma execução anterior: avisar quando terminar
+            revalidation = st.session_state.get("bitrix_revalidation")
+            if revalidation is not None and revalidation.done.is_set():
+                del st.session_state["bitrix_revalidation"]
+                if revalidation.succeeded:
+                    st.success(f"✅ Dados atualizados com o Bitrix24 às {revalidation.finished_at:%H:%M}.")
+                else:
+                    st.warning("⚠️ Não foi possível atualizar os dados com o Bitrix24; os dados salvos continuam em uso.")
+            
             try:
                 # Carregar dados do Bitrix24
                 if DIAGNOSTICO:
@@ -620,10 +654,36 @@ class ResponsavelDashboard:
                     st.error("Não foi possível carregar dados do Bitrix24.")
                     return pd.DataFrame()  # Retornar DataFrame vazio
                 
+                # Bitrix24 indisponível: avisar que os dados exibidos vêm do último snapshot
+                load_info = st.session_state.bitrix_integration.last_load_info or {}
+                if load_info.get("source") == "snapshot":
+                    salvo_em = load_info["timestamp"]
+                    st.warning(
+                        f"⚠️ O Bitrix24 não está respondendo. Exibindo os últimos dados salvos, "
+                        f"de {salvo_em:%d/%m/%Y %H:%M} (há {formatar_idade(salvo_em)})."
+                    )
+                elif load_info.get("source") == "stale":
+                    salvo_em = load_info["timestamp"]
+                    if load_info["revalidation"] is not None:
+                        st.session_state.bitrix_revalidation = load_info["revalidation"]
+                        st.info(
+                            f"🔄 Exibindo os dados salvos de {salvo_em:%d/%m/%Y %H:%M} (há {formatar_idade(salvo_em)}) "
+                            f"enquanto a atualização com o Bitrix24 roda em segundo plano; a página será recarregada ao terminar."
+                        )
+                    else:
+                        st.warning(
+                            f"⚠️ O Bitrix24 não está respondendo. Exibindo os dados salvos de "
+                            f"{salvo_em:%d/%m/%Y %H:%M} (há {formatar_idade(salvo_em)}); uma nova tentativa será feita em breve."
+                        )
+                
                 if DIAGNOSTICO:
                     st.success(f"Dados carregados com sucesso. Total de registros: {len(df)}")
                     st.write("Primeiras 5 linhas:")
                     st.dataframe(df.head())
+                    st.write("Limitador de requisições:", st.session_state.bitrix_integration.connector.rate_limiter.stats())
+                    st.write("Disjuntor:", st.session_state.bitrix_integration.connector.circuit_breaker.stats())
+                    st.write("Cache:", st.session_state.bitrix_integration.repository.cache_stats())
+                    st.write("Dados em memória:", shared_datasets.stats())
                 
                 return df
                 
@@ -635,6 +695,30 @@ class ResponsavelDashboard:
                     st.code(traceback.format_exc())
                 return pd.DataFrame()  # Retornar DataFrame vazio
 
+    @staticmethod
+    def _watch_revalidation():
+        """
+        Reexecuta a página quando a atualização em segundo plano terminar com
+        sucesso, para exibir os dados novos sem esperar uma interação do usuário.
+        
+        Deve ser chamado ao final da renderização. Um fragmento vazio verifica a
+        atualização a cada REVALIDATION_POLL_SECONDS, sem bloquear a página. Uma
+        atualização sem sucesso não recarrega a página (os dados exibidos são os
+        mesmos); o aviso aparece na próxima interação.
+        """
+        revalidation = st.session_state.get("bitrix_revalidation")
+        if revalidation is None or (revalidation.done.is_set() and not revalidation.succeeded):
+            return
+        if revalidation.done.is_set():
+            st.rerun()
+        
+        @st.fragment(run_every=REVALIDATION_POLL_SECONDS)
+        def aguardar_atualizacao():
+            if revalidation.done.is_set() and revalidation.succeeded:
+                st.rerun()
+        
+        aguardar_atualizacao()
+    
     @staticmethod
     def _load_from_csv():
         """Carrega dados do arquivo CSV local (método original)"""
@@ -684,21 +768,13 @@ class ResponsavelDashboard:
                     print("Aviso: Coluna ID não encontrada. Criando coluna ID sequencial.")
                     df["ID"] = range(1, len(df) + 1)
                 
-                # Converter colunas de data para datetime se forem strings
-                date_columns = ["Criado", "Modificado", "FECHADO"]
-                for col in date_columns:
-                    if col in df.columns and df[col].dtype != 'datetime64[ns]':
-                        try:
-                            df[col] = pd.to_datetime(df[col], errors='coerce')
-                        except Exception as e:
-                            print(f"Aviso: Não foi possível converter a coluna {col} para data: {str(e)}")
-                
                 # Retirar espaços extras das strings
                 for col in df.columns:
                     if df[col].dtype == 'object':
                         df[col] = df[col].str.strip()
                 
-                return df
+                # Aplicar os tipos do esquema (datas, categorias, IDs inteiros)
+                return enforce_schema(df)
             else:
                 st.error("DataFrame vazio após processamento.")
                 return pd.DataFrame()
@@ -717,11 +793,11 @@ class ResponsavelDashboard:
             if "Modificado" not in df.columns:
                 return "N/A"
             
-            # Converter coluna Modificado para datetime se ainda não for
-            df['Modificado'] = pd.to_datetime(df['Modificado'], dayfirst=True, errors='coerce')
+            # A coluna Modificado já chega em datetime (schema.enforce_schema)
+            require_datetime(df, ['Modificado'])
             
             # Calcular a diferença entre a data atual e a data de modificação
-            hoje = pd.Timestamp.now()
+            hoje = pd.Timestamp.now(tz=df['Modificado'].dt.tz)
             df['Dias_Sem_Modificacao'] = (hoje - df['Modificado']).dt.days
             
             # Contar cards sem modificação nos últimos 3 dias
@@ -778,11 +854,11 @@ class ResponsavelDashboard:
                 st.markdown('</div>', unsafe_allow_html=True)  # Fechar div container
                 return
             
-            # Converter coluna Modificado para datetime se ainda não for
-            df['Modificado'] = pd.to_datetime(df['Modificado'], dayfirst=True, errors='coerce')
+            # A coluna Modificado já chega em datetime (schema.enforce_schema)
+            require_datetime(df, ['Modificado'])
             
             # Calcular a diferença entre a data atual e a data de modificação
-            hoje = pd.Timestamp.now()
+            hoje = pd.Timestamp.now(tz=df['Modificado'].dt.tz)
             df['Dias_Sem_Modificacao'] = (hoje - df['Modificado']).dt.days
             
             # Filtrar cards sem modificação entre 3 e 32 dias
@@ -856,7 +932,7 @@ class ResponsavelDashboard:
             
             if "Responsável" in df_sem_modificacao.columns:
                 # Agrupar por responsável e contar cards
-                resp_count = df_sem_modificacao.groupby("Responsável").size().reset_index(name="Quantidade")
+                resp_count = df_sem_modificacao.groupby("Responsável", observed=True).size().reset_index(name="Quantidade")
                 resp_count = resp_count.sort_values("Quantidade", ascending=False)
                 
                 # Criar gráfico de barras
@@ -978,8 +1054,8 @@ class ResponsavelDashboard:
             
             # Contar total de registros com data de fechamento preenchida
             if "FECHADO" in df.columns:
-                # Filtrar apenas registros com data de fechamento válida (não vazia e não nula)
-                df_fechados_data = df[df["FECHADO"].notna() & (df["FECHADO"] != '') & (df["FECHADO"] != 'nan') & (df["FECHADO"] != 'None')]
+                # Filtrar apenas registros com data de fechamento (datas vazias ou inválidas já são NaT)
+                df_fechados_data = df[df["FECHADO"].notna()]
                 
                 # Considerar também negócios na fase "VALIDADO ENVIAR FINANCEIRO" como fechados
                 df_validado_financeiro = df[df["Fase"] == "VALIDADO ENVIAR FINANCEIRO"]
@@ -1180,7 +1256,7 @@ class ResponsavelDashboard:
             
             # Criar DataFrame completo com todas as fases, preenchendo com zeros onde necessário
             all_fases = pd.DataFrame({"Fase": FASES_ORDEM})
-            fase_counts = pd.merge(all_fases, fase_counts, on="Fase", how="left").fillna(0)
+            fase_counts = pd.merge(all_fases, fase_counts, on="Fase", how="left").fillna({"Quantidade": 0})
             
             # Ordenar conforme a ordem definida
             fase_counts["Fase_Order"] = fase_counts["Fase"].apply(lambda x: FASES_ORDEM.index(x) if x in FASES_ORDEM else 999)
@@ -1292,7 +1368,7 @@ class ResponsavelDashboard:
                 
                 # Criar DataFrame completo com todas as fases do FASES_ORDEM
                 all_fases = pd.DataFrame({"Fase": FASES_ORDEM})
-                fase_counts = pd.merge(all_fases, fase_counts, on="Fase", how="left").fillna(0)
+                fase_counts = pd.merge(all_fases, fase_counts, on="Fase", how="left").fillna({"Quantidade": 0})
                 
                 # Ordenar conforme a ordem definida
                 fase_counts["Fase_Order"] = fase_counts["Fase"].apply(lambda x: FASES_ORDEM.index(x) if x in FASES_ORDEM else 999)
@@ -1349,8 +1425,13 @@ class ResponsavelDashboard:
             columns='Fase',
             values='ID',
             aggfunc='count',
-            fill_value=0
-        ).reset_index()
+            fill_value=0,
+            observed=True
+        )
+        
+        # Colunas categóricas: converter os nomes das fases para texto antes de inserir novas colunas
+        pivot_df.columns = pivot_df.columns.astype(str)
+        pivot_df = pivot_df.reset_index()
         
         # Adicionar coluna de total
         pivot_df['Total'] = pivot_df.iloc[:, 1:].sum(axis=1)
@@ -1394,21 +1475,20 @@ class ResponsavelDashboard:
                 st.warning("Coluna 'LINK ARVORE DA FAMÍLIA PLATAFORMA' não encontrada no arquivo CSV.")
                 return
             
-            # Filtrar apenas registros com links válidos
-            df_links_validos = df[df["LINK ARVORE DA FAMÍLIA PLATAFORMA"].notna() & 
-                                (df["LINK ARVORE DA FAMÍLIA PLATAFORMA"] != '') & 
-                                (df["LINK ARVORE DA FAMÍLIA PLATAFORMA"] != 'nan') & 
-                                (df["LINK ARVORE DA FAMÍLIA PLATAFORMA"] != 'None')]
-            
-            # Identificar links duplicados
-            links_counts = df_links_validos["LINK ARVORE DA FAMÍLIA PLATAFORMA"].value_counts()
-            links_duplicados = links_counts[links_counts > 1]
-            links_unicos = links_counts[links_counts == 1]
+            # Calcular sob demanda apenas as colunas de duplicados usadas nesta seção; com a
+            # integração, o cálculo fica no conjunto compartilhado e vale para todas as sessões
+            integration = st.session_state.get("bitrix_integration")
+            if integration is not None:
+                df = integration.ensure_columns(df, ["grupo_link", "total_duplicados"])
+            else:
+                df = DataProcessor.ensure_columns(df, ["grupo_link", "total_duplicados"])
+            indice_duplicados = DataProcessor.duplicate_index(df)
+            tamanhos = indice_duplicados["tamanho"]
             
             # Calcular métricas corretas
-            total_links_unicos = len(links_unicos)
-            total_links_duplicados = len(links_duplicados)
-            total_registros_afetados = sum(links_duplicados.values)
+            total_links_unicos = int((tamanhos == 1).sum())
+            total_links_duplicados = int((tamanhos > 1).sum())
+            total_registros_afetados = int(tamanhos[tamanhos > 1].sum())
             
             # Melhorar o CSS para as métricas
             st.markdown("""
@@ -1463,22 +1543,16 @@ class ResponsavelDashboard:
                 total_registros_afetados
             ), unsafe_allow_html=True)
             
-            if len(links_duplicados) == 0:
+            if total_links_duplicados == 0:
                 st.success("Não foram encontrados Famílias duplicados! Todos os registros estão corretos.")
                 return
             
-            # Criar tabela completa com todos os registros que têm links duplicados
-            df_duplicados = pd.DataFrame()
-            
-            for link, count in links_duplicados.items():
-                # Obter todos os registros com este link
-                registros_link = df_links_validos[df_links_validos["LINK ARVORE DA FAMÍLIA PLATAFORMA"] == link].copy()
-                
-                # Adicionar uma coluna indicando o total de duplicações
-                registros_link["Total Duplicados"] = count
-                
-                # Adicionar ao DataFrame final
-                df_duplicados = pd.concat([df_duplicados, registros_link])
+            # Criar tabela completa com todos os registros que têm links duplicados,
+            # agrupados por link e dos links mais repetidos para os menos repetidos
+            df_duplicados = df[df["total_duplicados"] > 1].rename(columns={"total_duplicados": "Total Duplicados"})
+            df_duplicados = df_duplicados.sort_values(
+                ["Total Duplicados", "grupo_link"], ascending=[False, True], kind="stable"
+            )
             
             # Selecionar colunas para exibição na tabela
             colunas_exibicao = ["ID", "Responsável", "Fase", "LINK ARVORE DA FAMÍLIA PLATAFORMA", "Total Duplicados"]
@@ -1814,8 +1888,7 @@ class ResponsavelDashboard:
             # Verificar se a coluna FECHADO existe
             if "FECHADO" in df.columns:
                 # Converter para datetime se ainda não for
-                if not pd.api.types.is_datetime64_any_dtype(df_finalizados["FECHADO"]):
-                    df_finalizados["FECHADO"] = pd.to_datetime(df_finalizados["FECHADO"], dayfirst=True, errors='coerce')
+                require_datetime(df_finalizados, ["FECHADO"])
                 
                 # Marcar negócios na fase "VALIDADO ENVIAR FINANCEIRO" como fechados
                 # Se não tiverem data de fechamento, usar a data de modificação
@@ -2026,17 +2099,19 @@ class ResponsavelDashboard:
                     st.markdown("### Análise por Responsável")
                     
                     # Agrupar por responsável
-                    resp_analysis = df_finalizados.groupby("Responsável").agg(
+                    resp_analysis = df_finalizados.groupby("Responsável", observed=True).agg(
                         Total_Finalizados=("ID", "count"),
                     ).reset_index()
                     
                     # Adicionar contagem de fechados por responsável
-                    resp_fechados = df_com_fechamento.groupby("Responsável").agg(
+                    resp_fechados = df_com_fechamento.groupby("Responsável", observed=True).agg(
                         Total_Com_Fechamento=("ID", "count")
                     ).reset_index()
                     
-                    # Mesclar os DataFrames
-                    resp_analysis = pd.merge(resp_analysis, resp_fechados, on="Responsável", how="left").fillna(0)
+                    # Mesclar os DataFrames (preencher só a contagem: "Responsável" é categórica
+                    # e não aceita 0 como valor)
+                    resp_analysis = pd.merge(resp_analysis, resp_fechados, on="Responsável", how="left")
+                    resp_analysis = resp_analysis.fillna({"Total_Com_Fechamento": 0})
                     
                     # Calcular percentual de fechados
                     resp_analysis["Total_Com_Fechamento"] = resp_analysis["Total_Com_Fechamento"].astype(int)
@@ -2149,7 +2224,10 @@ class ResponsavelDashboard:
                                 try:
                                     if not st.session_state.use_csv:
                                         # Forçar atualização dos dados do Bitrix24
-                                        st.session_state.bitrix_integration.refresh_data(force_refresh=True)
+                                        st.session_state.bitrix_integration.refresh_data(
+                                            force_refresh=True,
+                                            category_id=BITRIX_CATEGORY_ID
+                                        )
                                     
                                     # Limpar o cache do Streamlit
                                     st.cache_data.clear()
@@ -2366,6 +2444,9 @@ class ResponsavelDashboard:
             </div>
             """, unsafe_allow_html=True)
             
+            # Dados expirados em exibição: recarregar quando a atualização terminar
+            cls._watch_revalidation()
+            
         except Exception as e:
             st.error(f"Erro ao renderizar o dashboard de responsáveis: {str(e)}")
             